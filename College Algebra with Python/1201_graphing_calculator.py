@@ -1,12 +1,1111 @@
+import argparse
+import ast
+import csv
+import functools
+import json
+import math
+import os
+import queue
+import random
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
 import matplotlib.pyplot as plt
 import numpy as np
-import random
-import math
-import tkinter as tk
-from tkinter import ttk, messagebox
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from contourpy import contour_generator
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from matplotlib.figure import Figure
 
+try:
+    import tkinter as tk
+    from tkinter import ttk, messagebox, filedialog
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+except ImportError:  # Batch rendering still works on installs without Tk
+    tk = None
+
+# Names an expression may use, mapped to their NumPy (array-aware) equivalents
+SAFE_FUNCTIONS = {
+    'sin': np.sin, 'cos': np.cos, 'tan': np.tan,
+    'asin': np.arcsin, 'acos': np.arccos, 'atan': np.arctan,
+    'sinh': np.sinh, 'cosh': np.cosh, 'tanh': np.tanh,
+    'sqrt': np.sqrt, 'log': np.log, 'log10': np.log10,
+    'exp': np.exp, 'abs': np.abs,
+    'floor': np.floor, 'ceil': np.ceil, 'round': np.round
+}
+SAFE_CONSTANTS = {'pi': math.pi, 'e': math.e}
+
+ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.UAdd, ast.USub
+)
+
+
+class CompiledExpression:
+    """A validated expression compiled once and evaluated on whole NumPy arrays"""
+    
+    def __init__(self, source, variables=('x',)):
+        self.source = source
+        self.variables = tuple(variables)
+        
+        try:
+            tree = ast.parse(source.strip(), mode='eval')
+        except SyntaxError:
+            raise ValueError(f"Invalid expression: {source}")
+        digits = self._validate(tree)
+        
+        # Float constants keep powers like 9**9**9 from becoming huge Python ints;
+        # the digits argument of round() has to stay an integer
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Constant) and id(node) not in digits:
+                node.value = float(node.value)
+        self.code = compile(tree, '<expression>', 'eval')
+        self.namespace = {"__builtins__": {}, **SAFE_FUNCTIONS, **SAFE_CONSTANTS}
+        
+    def _validate(self, tree):
+        """Reject anything that is not plain arithmetic on known names; returns the ids of
+        the integer constants used as round() digits"""
+        digits = set()
+        for node in ast.walk(tree):
+            if not isinstance(node, ALLOWED_NODES):
+                raise ValueError(f"Unsupported syntax in expression: {type(node).__name__}")
+            if isinstance(node, ast.Call):
+                if not isinstance(node.func, ast.Name) or node.func.id not in SAFE_FUNCTIONS:
+                    raise ValueError("Only the built-in math functions can be called")
+                if node.func.id == 'round' and not node.keywords and len(node.args) == 2:
+                    digits.add(id(self._round_digits(node.args[1])))
+                elif node.keywords or len(node.args) != 1:
+                    raise ValueError(f"{node.func.id}() takes exactly one argument")
+            elif isinstance(node, ast.Name):
+                if node.id not in SAFE_FUNCTIONS and node.id not in SAFE_CONSTANTS \
+                        and node.id not in self.variables:
+                    raise ValueError(f"Unknown name in expression: {node.id}")
+            elif isinstance(node, ast.Constant):
+                if not isinstance(node.value, (int, float)) or isinstance(node.value, bool):
+                    raise ValueError("Only numeric constants are allowed")
+        return digits
+        
+    @staticmethod
+    def _round_digits(node):
+        """The constant of round(x, n) or round(x, -n); n must be an integer"""
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            node = node.operand
+        if not isinstance(node, ast.Constant) or type(node.value) is not int:
+            raise ValueError("round() digits must be an integer constant")
+        return node
+                    
+    def __call__(self, *values):
+        """Evaluate over arrays; undefined results (domain errors, poles) become NaN"""
+        arrays = [np.asarray(value, dtype=float) for value in values]
+        shape = np.broadcast_shapes(*(array.shape for array in arrays))
+        namespace = dict(zip(self.variables, arrays))
+        
+        try:
+            with np.errstate(all='ignore'):
+                result = eval(self.code, self.namespace, namespace)
+                result = np.asarray(result, dtype=float)
+        except (ArithmeticError, ValueError, TypeError):
+            return np.full(shape, np.nan)
+            
+        result = np.broadcast_to(result, shape).copy()
+        result[~np.isfinite(result)] = np.nan
+        return result
+        
+    def __repr__(self):
+        return f"CompiledExpression({self.source!r})"
+
+
+@functools.lru_cache(maxsize=256)
+def compile_expression(expr, variables=('x',)):
+    """Parse and validate an expression once; repeated calls return the same object"""
+    return CompiledExpression(expr, variables)
+
+
+class EvaluationCancelled(Exception):
+    """Raised inside a background job that a newer request has superseded"""
+
+
+def check_cancelled(cancelled):
+    """Abort the current job if its cancellation callback says so"""
+    if cancelled is not None and cancelled():
+        raise EvaluationCancelled()
+
+
+# Adaptive sampling: coarse start, refinement budget and finest subdivision level
+ADAPTIVE_INITIAL_POINTS = 65
+ADAPTIVE_POINT_BUDGET = 1000
+ADAPTIVE_MAX_DEPTH = 12
+CURVATURE_TOLERANCE = 1e-3  # fraction of the visible y-span (about one pixel)
+JUMP_TOLERANCE = 0.02       # fraction of the visible y-span
+
+
+def adaptive_sample(func, x_min, x_max, y_min, y_max, budget=ADAPTIVE_POINT_BUDGET,
+                    initial_points=ADAPTIVE_INITIAL_POINTS, max_depth=ADAPTIVE_MAX_DEPTH,
+                    y_span=None, cancelled=None):
+    """Sample func on [x_min, x_max], refining only where it bends or jumps in view"""
+    x = np.linspace(x_min, x_max, initial_points)
+    y = func(x)
+    
+    # Tolerances scale with the visible height unless the caller pins them
+    if y_span is None:
+        y_span = y_max - y_min
+    curve_tol = CURVATURE_TOLERANCE * y_span
+    jump_tol = JUMP_TOLERANCE * y_span
+    min_width = (x_max - x_min) / (initial_points - 1) / 2**max_depth
+    
+    while len(x) < budget:
+        check_cancelled(cancelled)
+        dx = np.diff(x)
+        
+        # Distance of each interior point from the chord through its neighbours
+        t = (x[1:-1] - x[:-2]) / (x[2:] - x[:-2])
+        bend = np.abs(y[1:-1] - (y[:-2] + t * (y[2:] - y[:-2]))) / curve_tol
+        bend = np.nan_to_num(bend, nan=0.0)
+        score = np.zeros(len(dx))
+        score[:-1] = bend
+        score[1:] = np.maximum(score[1:], bend)
+        
+        # Jumps that stand out from the neighbouring intervals
+        magnitude, neighbour_mag = _jump_sizes(y)
+        jump = magnitude / np.maximum(jump_tol, 2 * neighbour_mag)
+        score = np.maximum(score, np.nan_to_num(jump, nan=0.0))
+        
+        # Edges of the domain (one end defined, the other not)
+        score[np.isnan(y[:-1]) != np.isnan(y[1:])] = np.inf
+        # Intervals entirely above or below the view are never drawn
+        with np.errstate(invalid='ignore'):
+            hidden = (((y[:-1] > y_max) & (y[1:] > y_max))
+                      | ((y[:-1] < y_min) & (y[1:] < y_min)))
+        score[hidden] = 0
+        
+        candidates = np.flatnonzero((score > 1) & (dx > 2 * min_width))
+        if len(candidates) == 0:
+            break
+        remaining = budget - len(x)
+        if len(candidates) > remaining:
+            # Breadth first, so one pole cannot starve the rest of the curve
+            order = np.lexsort((-score[candidates], -dx[candidates]))
+            candidates = np.sort(candidates[order[:remaining]])
+            
+        x_new = (x[candidates] + x[candidates + 1]) / 2
+        x = np.insert(x, candidates + 1, x_new)
+        y = np.insert(y, candidates + 1, func(x_new))
+        
+    return x, y
+
+
+def _jump_sizes(y):
+    """Per-interval |dy| and the larger |dy| of its two neighbouring intervals"""
+    magnitude = np.abs(np.diff(y))
+    prev_mag = np.concatenate(([0.0], magnitude[:-1]))
+    next_mag = np.concatenate((magnitude[1:], [0.0]))
+    return magnitude, np.nan_to_num(np.maximum(prev_mag, next_mag), nan=0.0)
+
+
+def split_discontinuities(x, y, y_span):
+    """Break the curve (with a NaN) wherever a jump looks like a pole or a step"""
+    if len(x) < 3:
+        return x, y
+        
+    magnitude, neighbour_mag = _jump_sizes(y)
+    direction = np.sign(np.diff(y))
+    
+    # A jump against the direction of both neighbours cannot be a steep slope
+    prev_dir = np.concatenate(([np.nan], direction[:-1]))
+    next_dir = np.concatenate((direction[1:], [np.nan]))
+    
+    with np.errstate(invalid='ignore'):
+        breaks = ((magnitude > JUMP_TOLERANCE * y_span)
+                  & (direction != prev_dir) & (direction != next_dir)
+                  & (magnitude > neighbour_mag))
+    
+    indices = np.flatnonzero(breaks)
+    if len(indices) == 0:
+        return x, y
+    x_break = (x[indices] + x[indices + 1]) / 2
+    return np.insert(x, indices + 1, x_break), np.insert(y, indices + 1, np.nan)
+
+
+# Viewport cache: tiles are power-of-two wide so zooming keeps hitting the same tiles
+SAMPLE_CACHE_BYTES = 32 * 1024 * 1024
+TILES_PER_VIEW = 4
+
+
+class SampleCache:
+    """Memory-bounded LRU cache of sampled tiles, keyed by expression and x-interval"""
+    
+    def __init__(self, max_bytes=SAMPLE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.tiles = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()  # Shared by the UI thread and the workers
+        
+    def get(self, key):
+        """Return the cached (x, y) tile or None, marking it recently used"""
+        with self.lock:
+            tile = self.tiles.get(key)
+            if tile is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.tiles.move_to_end(key)
+            return tile
+        
+    def put(self, key, x, y):
+        """Store a tile, evicting the least recently used ones beyond max_bytes"""
+        with self.lock:
+            if key in self.tiles:
+                old_x, old_y = self.tiles.pop(key)
+                self.nbytes -= old_x.nbytes + old_y.nbytes
+            self.tiles[key] = (x, y)
+            self.nbytes += x.nbytes + y.nbytes
+            
+            while self.nbytes > self.max_bytes and len(self.tiles) > 1:
+                _, (old_x, old_y) = self.tiles.popitem(last=False)
+                self.nbytes -= old_x.nbytes + old_y.nbytes
+            
+    def clear(self):
+        """Drop every tile and reset the counters"""
+        with self.lock:
+            self.tiles.clear()
+            self.nbytes = 0
+            self.hits = self.misses = 0
+        
+    def stats(self):
+        """Hit/miss counters and current size, for checking the cache is effective"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "tiles": len(self.tiles),
+                "bytes": self.nbytes
+            }
+
+
+def sample_tiles(func, x_min, x_max, y_min, y_max, cache, cancelled=None):
+    """Assemble view samples from cached tiles, sampling only the missing ones"""
+    try:
+        tile_width = 2.0 ** math.floor(math.log2((x_max - x_min) / TILES_PER_VIEW))
+        
+        # The y band is snapped to the same kind of grid so small zooms reuse tiles
+        y_step = 2.0 ** math.floor(math.log2(y_max - y_min))
+        band_min = math.floor(y_min / y_step) * y_step
+        band_max = math.ceil(y_max / y_step) * y_step
+        first = math.floor(x_min / tile_width)
+        last = math.ceil(x_max / tile_width)
+    except (OverflowError, ValueError):
+        # Spans near the float limits have no tile grid, so such views are sampled uncached
+        return adaptive_sample(func, x_min, x_max, y_min, y_max, cancelled=cancelled)
+    
+    tile_budget = ADAPTIVE_POINT_BUDGET // TILES_PER_VIEW
+    tile_points = (ADAPTIVE_INITIAL_POINTS - 1) // TILES_PER_VIEW + 1
+    
+    xs, ys = [], []
+    for index in range(first, last):
+        key = (func, tile_width, index, band_min, band_max)
+        tile = cache.get(key)
+        if tile is None:
+            tile = adaptive_sample(func, index * tile_width, (index + 1) * tile_width,
+                                   band_min, band_max, budget=tile_budget,
+                                   initial_points=tile_points, y_span=y_step,
+                                   cancelled=cancelled)
+            cache.put(key, *tile)
+        
+        # Neighbouring tiles share their edge sample
+        start = 1 if xs else 0
+        xs.append(tile[0][start:])
+        ys.append(tile[1][start:])
+        
+    return np.concatenate(xs), np.concatenate(ys)
+
+
+def sample_function(func, x_min, x_max, y_min, y_max, cache=None, cancelled=None):
+    """Adaptive samples of func for the given view, split at discontinuities"""
+    if cache is None:
+        x, y = adaptive_sample(func, x_min, x_max, y_min, y_max, cancelled=cancelled)
+    else:
+        x, y = sample_tiles(func, x_min, x_max, y_min, y_max, cache, cancelled)
+    return split_discontinuities(x, y, y_max - y_min)
+
+
+# Implicit and parametric curves: one vectorised pass over a viewport-sized grid
+IMPLICIT_CELL_PIXELS = 3
+IMPLICIT_MAX_CELLS = 400
+PARAMETRIC_MIN_POINTS = 200
+PARAMETRIC_MAX_POINTS = 4000
+
+
+class ImplicitCurve:
+    """An equation such as x**2 + y**2 = 25, drawn as the zero contour of lhs - rhs"""
+    
+    def __init__(self, source):
+        lhs, rhs = source.split('=', 1)
+        if '=' in rhs or not lhs.strip() or not rhs.strip():
+            raise ValueError("An implicit equation needs one expression on each side of a single '='")
+        self.source = source
+        self.func = compile_expression(f"({lhs.strip()}) - ({rhs.strip()})", ('x', 'y'))
+        
+    def sample(self, x_min, x_max, y_min, y_max, width, height):
+        """Marching-squares contour on a grid of about one cell per few pixels"""
+        columns = int(np.clip(width // IMPLICIT_CELL_PIXELS, 20, IMPLICIT_MAX_CELLS))
+        rows = int(np.clip(height // IMPLICIT_CELL_PIXELS, 20, IMPLICIT_MAX_CELLS))
+        x = np.linspace(x_min, x_max, columns + 1)
+        y = np.linspace(y_min, y_max, rows + 1)
+        z = self.func(x[np.newaxis, :], y[:, np.newaxis])
+        
+        lines = contour_generator(x, y, z).lines(0.0)
+        if not lines:
+            return np.array([]), np.array([])
+        # NaN rows let every separate contour share one artist
+        points = np.concatenate([np.vstack((line, [[np.nan, np.nan]])) for line in lines])
+        
+        # Sign flips across a pole also produce contour vertices, but there the
+        # function is nowhere near zero; a real crossing is within a grid step
+        steps = np.concatenate((np.abs(np.diff(z, axis=0)).ravel(), np.abs(np.diff(z, axis=1)).ravel()))
+        steps = steps[np.isfinite(steps)]
+        if len(steps):
+            residual = np.abs(self.func(points[:, 0], points[:, 1]))
+            with np.errstate(invalid='ignore'):
+                points[residual > 10 * np.median(steps)] = np.nan
+        return points[:, 0], points[:, 1]
+
+
+class ParametricCurve:
+    """A curve (x(t), y(t)), optionally written (x(t), y(t), t_min, t_max)"""
+    
+    def __init__(self, source):
+        self.source = source
+        source = source.strip()
+        try:
+            tree = ast.parse(source, mode='eval')
+        except SyntaxError:
+            raise ValueError(f"Invalid expression: {source}")
+        if not isinstance(tree.body, ast.Tuple) or len(tree.body.elts) not in (2, 4):
+            raise ValueError("Parametric curves look like (x(t), y(t)) or (x(t), y(t), t_min, t_max)")
+        parts = [ast.get_source_segment(source, part) for part in tree.body.elts]
+        
+        self.x_func = compile_expression(parts[0], ('t',))
+        self.y_func = compile_expression(parts[1], ('t',))
+        if len(parts) == 4:
+            self.t_min = float(compile_expression(parts[2], ())())
+            self.t_max = float(compile_expression(parts[3], ())())
+            if not self.t_min < self.t_max:
+                raise ValueError("The parameter range must have t_min < t_max")
+        else:
+            self.t_min, self.t_max = 0.0, 2 * math.pi
+            
+    def sample(self, x_min, x_max, y_min, y_max, width, height):
+        """Evaluate both coordinates over t in one pass, sized to the canvas"""
+        points = int(np.clip(2 * (width + height), PARAMETRIC_MIN_POINTS, PARAMETRIC_MAX_POINTS))
+        t = np.linspace(self.t_min, self.t_max, points)
+        return self.x_func(t), self.y_func(t)
+
+
+def curve_kind(expression):
+    """'explicit' for y = f(x), 'implicit' for an equation, 'parametric' for a tuple"""
+    if '=' in expression:
+        return 'implicit'
+    try:
+        tree = ast.parse(expression.strip(), mode='eval')
+    except SyntaxError:
+        return 'explicit'  # Let the explicit compiler report the error
+    return 'parametric' if isinstance(tree.body, ast.Tuple) else 'explicit'
+
+
+@functools.lru_cache(maxsize=256)
+def compile_curve(expression):
+    """Compile any kind of function the calculator can graph"""
+    kind = curve_kind(expression)
+    if kind == 'implicit':
+        return ImplicitCurve(expression)
+    if kind == 'parametric':
+        return ParametricCurve(expression)
+    return compile_expression(expression)
+
+
+def function_label(name, expression):
+    """Legend and list text for a function of any kind"""
+    kind = curve_kind(expression)
+    if kind == 'implicit':
+        return f"{name}: {expression}"
+    if kind == 'parametric':
+        return f"{name}(t) = {expression}"
+    return f"{name}(x) = {expression}"
+
+
+def sample_curve(curve, x_min, x_max, y_min, y_max, width, height, cache=None, cancelled=None):
+    """Samples of any curve for the view; the flag says whether x is increasing"""
+    if isinstance(curve, CompiledExpression):
+        x, y = sample_function(curve, x_min, x_max, y_min, y_max, cache, cancelled)
+        return x, y, True
+    x, y = curve.sample(x_min, x_max, y_min, y_max, width, height)
+    return x, y, False
+
+
+# Level of detail: at most first/last/min/max per pixel column reaches matplotlib
+DECIMATION_FACTOR = 4
+
+
+def decimate_minmax(x, y, x_min, x_max, columns):
+    """Reduce a series with increasing x to its first, last, min and max point per
+    pixel column. Spikes survive, and NaN breaks are kept as they are."""
+    if columns <= 0 or len(x) <= DECIMATION_FACTOR * columns:
+        return x, y
+        
+    nan = np.isnan(y)
+    column = np.floor((x - x_min) * (columns / (x_max - x_min)))
+    # Everything left or right of the view shares one off-screen column per side
+    column = np.clip(column, -1, columns).astype(np.int64)
+    segment = np.cumsum(nan)
+    key = np.where(nan, -1, segment * (columns + 2) + column + 1)
+    
+    starts = np.flatnonzero(np.concatenate(([True], key[1:] != key[:-1])))
+    ends = np.concatenate((starts[1:], [len(x)])) - 1
+    run = np.cumsum(np.concatenate(([True], key[1:] != key[:-1]))) - 1
+    by_value = np.lexsort((y, run))  # Within each run, lowest y first
+    
+    keep = np.unique(np.concatenate((starts, ends, by_value[starts], by_value[ends])))
+    return x[keep], y[keep]
+
+
+class EvaluationWorker:
+    """Runs sampling jobs on a thread pool and hands results back to the Tk thread"""
+    
+    POLL_INTERVAL_MS = 20
+    
+    def __init__(self, root, max_workers=2):
+        self.root = root
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix='evaluation')
+        self.results = queue.Queue()
+        self.generations = {}  # Latest generation per channel
+        self.epoch = 0         # Bumped by cancel_all to supersede every attached channel
+        self.closed = False
+        self.poll_id = self.root.after(self.POLL_INTERVAL_MS, self.poll)
+        
+    def submit(self, channel, job, callback, errback=None, detached=False):
+        """Run job(cancelled) off the main thread, superseding the channel's previous job
+        
+        Errors go to errback on the Tk thread. Detached jobs, such as exports,
+        are not superseded by cancel_all, only by cancel(channel) or shutdown.
+        """
+        generation = self.generations.get(channel, 0) + 1
+        self.generations[channel] = generation
+        epoch = None if detached else self.epoch
+        
+        def cancelled():
+            return (self.closed or generation != self.generations.get(channel)
+                    or epoch is not None and epoch != self.epoch)
+        
+        def run():
+            try:
+                result = job(cancelled)
+            except EvaluationCancelled:
+                return
+            except Exception as error:
+                if errback is None:
+                    raise
+                self.results.put((cancelled, errback, error))
+                return
+            self.results.put((cancelled, callback, result))
+            
+        self.executor.submit(run)
+        
+    def cancel(self, channel):
+        """Supersede whatever is running on one channel"""
+        self.generations[channel] = self.generations.get(channel, 0) + 1
+        
+    def cancel_all(self):
+        """Supersede every pending sampling job, e.g. when the view changes"""
+        self.epoch += 1
+        
+    def poll(self):
+        """Deliver finished results on the Tk thread, dropping superseded ones"""
+        # Rescheduled even if a callback raises, so one bad result cannot stop delivery
+        try:
+            while True:
+                try:
+                    cancelled, callback, result = self.results.get_nowait()
+                except queue.Empty:
+                    break
+                if not cancelled():
+                    callback(result)
+        finally:
+            if not self.closed:
+                self.poll_id = self.root.after(self.POLL_INTERVAL_MS, self.poll)
+        
+    def shutdown(self):
+        """Cancel outstanding work, detached jobs included, and stop polling"""
+        self.closed = True
+        self.root.after_cancel(self.poll_id)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class FunctionRenderer:
+    """Retained-mode plot: one Line2D per function, updated in place and blitted"""
+    
+    COLORS = ['blue', 'red', 'green', 'orange', 'purple', 'brown', 'pink', 'gray']
+    
+    def __init__(self, ax, canvas, blit=True):
+        self.ax = ax
+        self.canvas = canvas
+        self.blit = blit       # False when rendering straight to a file
+        self.lines = []        # One per function, in the same order
+        self.annotations = []  # Solution markers, dropped on the next replot
+        self.legend = None
+        self.background = None
+        self.samples = {}      # Full-resolution data per line, before decimation
+        
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+        self.canvas.mpl_connect('resize_event', self.on_resize)
+        
+    def setup_axes(self, x_min, x_max, y_min, y_max):
+        """Build the static background: grid, axes lines and labels"""
+        self.ax.grid(True, alpha=0.3)
+        self.ax.axhline(y=0, color='k', linewidth=0.5)
+        self.ax.axvline(x=0, color='k', linewidth=0.5)
+        self.ax.set_xlim(x_min, x_max)
+        self.ax.set_ylim(y_min, y_max)
+        self.ax.set_xlabel('x')
+        self.ax.set_ylabel('y')
+        self.ax.set_title('Graphing Calculator')
+        
+    def set_view(self, x_min, x_max, y_min, y_max):
+        """Change the axis limits; returns True if the background must be redrawn"""
+        if self.ax.get_xlim() == (x_min, x_max) and self.ax.get_ylim() == (y_min, y_max):
+            return False
+        self.ax.set_xlim(x_min, x_max)
+        self.ax.set_ylim(y_min, y_max)
+        self.background = None
+        self.decimate_all()
+        return True
+        
+    def add_line(self, label):
+        """Create the artist for a newly added function"""
+        color = self.COLORS[len(self.lines) % len(self.COLORS)]
+        line, = self.ax.plot([], [], color=color, linewidth=2, label=label, animated=self.blit)
+        self.lines.append(line)
+        self.update_legend()
+        return line
+        
+    def remove_line(self, index):
+        """Drop one function's artist; later lines shift down a colour like before"""
+        line = self.lines.pop(index)
+        self.samples.pop(line, None)
+        line.remove()
+        for i, line in enumerate(self.lines):
+            line.set_color(self.COLORS[i % len(self.COLORS)])
+        self.update_legend()
+        
+    def set_labels(self, labels):
+        """Match the artists to a whole new list of functions"""
+        while len(self.lines) > len(labels):
+            self.remove_line(-1)
+        while len(self.lines) < len(labels):
+            self.add_line(labels[len(self.lines)])
+        for line, label in zip(self.lines, labels):
+            line.set_label(label)
+        self.update_legend()
+        
+    def set_data(self, index, x, y, decimate=True):
+        """Replace the samples of one function"""
+        self.set_line_data(self.lines[index], x, y, decimate)
+        
+    def set_line_data(self, line, x, y, decimate=True):
+        """Keep the full samples and hand the artist a copy decimated to the screen
+        (decimation needs increasing x, so curves in x and y are drawn as given)"""
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        if not decimate:
+            self.samples.pop(line, None)
+            line.set_data(x, y)
+            return
+        self.samples[line] = (x, y)
+        self.decimate(line)
+        
+    def pixel_size(self):
+        """Width and height of the plotting area in pixels"""
+        return self.ax.bbox.width, self.ax.bbox.height
+        
+    def decimate(self, line):
+        """Recompute one line's level of detail for the current view and size"""
+        x, y = self.samples[line]
+        x_min, x_max = self.ax.get_xlim()
+        line.set_data(*decimate_minmax(x, y, x_min, x_max, int(self.ax.bbox.width)))
+        
+    def decimate_all(self):
+        for line in self.samples:
+            self.decimate(line)
+            
+    def on_resize(self, event):
+        """More or fewer pixel columns: redo the decimation before the redraw"""
+        self.background = None
+        self.decimate_all()
+        
+    def add_marker(self, x, y, label, style='ro'):
+        """Mark a point or points (e.g. solutions) until the next replot"""
+        marker, = self.ax.plot(x, y, style, markersize=8, label=label, animated=self.blit)
+        self.annotations.append(marker)
+        self.update_legend()
+        
+    def clear_annotations(self):
+        """Remove every solution marker"""
+        if not self.annotations:
+            return
+        for marker in self.annotations:
+            marker.remove()
+        self.annotations.clear()
+        self.update_legend()
+        
+    def update_legend(self):
+        """Rebuild the legend from the current artists"""
+        if self.legend is not None:
+            self.legend.remove()
+            self.legend = None
+        if self.lines or self.annotations:
+            self.legend = self.ax.legend(handles=self.lines + self.annotations)
+            self.legend.set_animated(self.blit)
+            
+    def dynamic_artists(self):
+        """Everything drawn on top of the cached background"""
+        artists = self.lines + self.annotations
+        if self.legend is not None:
+            artists.append(self.legend)
+        return artists
+        
+    def on_draw(self, event):
+        """After a full draw, cache the static background and paint the curves"""
+        if not self.blit:
+            return
+        self.background = self.canvas.copy_from_bbox(self.ax.figure.bbox)
+        for artist in self.dynamic_artists():
+            self.ax.draw_artist(artist)
+            
+    def redraw(self):
+        """Full draw; needed when the view (ticks, limits) or canvas size changes"""
+        self.canvas.draw()
+        
+    def refresh(self):
+        """Repaint only the curves over the cached background"""
+        if not self.blit or self.background is None:
+            self.redraw()
+            return
+        self.canvas.restore_region(self.background)
+        for artist in self.dynamic_artists():
+            self.ax.draw_artist(artist)
+        self.canvas.blit(self.ax.figure.bbox)
+
+
+# Root finding: one vectorised sign scan, then Brent's method inside each bracket
+ROOT_GRID_POINTS = 2001
+ROOT_TOLERANCE = 1e-12
+ROOT_MAX_ITERATIONS = 100
+
+
+def brent_roots(func, a, b, fa, fb, tolerance=ROOT_TOLERANCE, max_iterations=ROOT_MAX_ITERATIONS):
+    """Brent's method on many brackets at once
+    
+    a, b, fa, fb are arrays with fa and fb of opposite sign; func(active, t)
+    evaluates bracket number active[n] at t[n]. Each iteration advances every
+    unfinished bracket with a single vectorised evaluation.
+    """
+    a, b, fa, fb = (np.array(v, dtype=float) for v in (a, b, fa, fb))
+    c, fc = a.copy(), fa.copy()
+    d = b - a
+    e = d.copy()
+    active = np.flatnonzero(fb != 0)
+    eps = np.finfo(float).eps
+    
+    with np.errstate(all='ignore'):
+        for _ in range(max_iterations):
+            if len(active) == 0:
+                break
+            i = active
+            
+            # Keep the root bracketed between b and c
+            reset = fb[i] * fc[i] > 0
+            j = i[reset]
+            c[j], fc[j] = a[j], fa[j]
+            d[j] = e[j] = b[j] - a[j]
+            
+            # b is always the best estimate so far
+            swap = np.abs(fc[i]) < np.abs(fb[i])
+            j = i[swap]
+            a[j], b[j], c[j] = b[j], c[j], b[j]
+            fa[j], fb[j], fc[j] = fb[j], fc[j], fb[j]
+            
+            tol = 2 * eps * np.abs(b[i]) + 0.5 * tolerance
+            m = 0.5 * (c[i] - b[i])
+            unfinished = (np.abs(m) > tol) & (fb[i] != 0)
+            i, tol, m = i[unfinished], tol[unfinished], m[unfinished]
+            active = i
+            if len(i) == 0:
+                break
+                
+            # Inverse quadratic interpolation, or secant when only two points differ
+            s = fb[i] / fa[i]
+            q1 = fa[i] / fc[i]
+            r = fb[i] / fc[i]
+            secant = a[i] == c[i]
+            p = np.where(secant, 2 * m * s,
+                         s * (2 * m * q1 * (q1 - r) - (b[i] - a[i]) * (r - 1)))
+            q = np.where(secant, 1 - s, (q1 - 1) * (r - 1) * (s - 1))
+            q = np.where(p > 0, -q, q)
+            p = np.abs(p)
+            
+            interpolate = ((np.abs(e[i]) >= tol) & (np.abs(fa[i]) > np.abs(fb[i]))
+                           & (2 * p < np.minimum(3 * m * q - np.abs(tol * q), np.abs(e[i] * q))))
+            e[i] = np.where(interpolate, d[i], m)
+            d[i] = np.where(interpolate, p / q, m)
+            
+            a[i], fa[i] = b[i], fb[i]
+            b[i] += np.where(np.abs(d[i]) > tol, d[i], np.copysign(tol, m))
+            fb[i] = func(i, b[i])
+    return b
+
+
+def _evaluate_rows(compiled, indices, t):
+    """compiled[indices[n]](t[n]) for every n, with one call per distinct function"""
+    out = np.empty(len(t))
+    for j in np.unique(indices):
+        mask = indices == j
+        out[mask] = compiled[j](t[mask])
+    return out
+
+
+def _polish(func, x, values):
+    """Sign changes along each row of values, polished; returns (rows, roots)"""
+    exact_rows, exact_cols = np.nonzero(values == 0)
+    with np.errstate(invalid='ignore'):
+        change = np.sign(values[:, :-1]) * np.sign(values[:, 1:]) < 0
+    rows, cols = np.nonzero(change)
+    
+    fa, fb = values[rows, cols], values[rows, cols + 1]
+    roots = brent_roots(lambda active, t: func(rows[active], t), x[cols], x[cols + 1], fa, fb)
+    
+    # A sign change across a pole or a step converges onto the jump; drop it
+    with np.errstate(invalid='ignore'):
+        genuine = np.abs(func(rows, roots)) <= 1e-8 * (1 + np.abs(fa) + np.abs(fb))
+    return (np.concatenate((exact_rows, rows[genuine])),
+            np.concatenate((x[exact_cols], roots[genuine])))
+
+
+def find_roots_and_intersections(functions, x_min, x_max, points=ROOT_GRID_POINTS):
+    """Roots of every function and every pairwise intersection in [x_min, x_max]
+    
+    functions is a list of (name, expression). Returns (roots, intersections) as
+    lists of (name, x) and (name_a, name_b, x, y). Only sign-changing roots are
+    found, plus any that land exactly on the sampling grid.
+    """
+    names = [name for name, expr in functions]
+    compiled = [compile_expression(expr) for name, expr in functions]
+    if not compiled:
+        return [], []
+        
+    x = np.linspace(x_min, x_max, points)
+    y = np.vstack([func(x) for func in compiled])
+    
+    rows, xs = _polish(lambda rows, t: _evaluate_rows(compiled, rows, t), x, y)
+    roots = sorted((names[row], float(root)) for row, root in zip(rows, xs))
+    
+    # Every pair at once: row k of the difference matrix is f_first[k] - f_second[k]
+    first, second = np.triu_indices(len(compiled), k=1)
+    
+    def difference(rows, t):
+        return _evaluate_rows(compiled, first[rows], t) - _evaluate_rows(compiled, second[rows], t)
+    rows, xs = _polish(difference, x, y[first] - y[second])
+    ys = _evaluate_rows(compiled, first[rows], xs)
+    intersections = [(names[first[row]], names[second[row]], float(root), float(value))
+                     for row, root, value in zip(rows, xs, ys)]
+    
+    roots.sort(key=lambda item: item[1])
+    intersections.sort(key=lambda item: item[2])
+    return roots, intersections
+
+
+# Value tables: rows are computed on demand, never held in full
+TABLE_DEFAULT_ROWS = 21
+TABLE_EXPORT_CHUNK = 65536
+
+
+def table_row_count(start, end, step):
+    """Number of rows x = start, start + step, ... up to end (inclusive)"""
+    return int(math.floor((end - start) / step + 1e-9)) + 1
+
+
+def table_x_decimals(step):
+    """Enough decimals in x to tell neighbouring rows apart"""
+    return max(2, -math.floor(math.log10(abs(step))) + 1)
+
+
+def table_values(functions, start, step, first_row, count):
+    """x and one y array per function for rows first_row .. first_row + count - 1"""
+    x = start + step * np.arange(first_row, first_row + count, dtype=float)
+    return x, [compile_expression(func_str)(x) for func_name, func_str in functions]
+
+
+def table_columns(functions, start, step, first_row, count, decimals=4):
+    """Formatted x and y columns for the requested rows, for display"""
+    x, ys = table_values(functions, start, step, first_row, count)
+    columns = [np.char.mod(f"%.{table_x_decimals(step)}f", x)]
+    for y in ys:
+        formatted = np.char.mod(f"%.{decimals}f", y)
+        columns.append(np.where(np.isnan(y), "undefined", formatted))
+    return columns
+
+
+def export_table_csv(path, functions, start, end, step, chunk_size=TABLE_EXPORT_CHUNK,
+                     cancelled=None):
+    """Stream the value table to a CSV file chunk by chunk; returns the row count
+    
+    Rows go to a temporary file that replaces path only once complete, so a
+    cancelled or failed export never leaves a truncated CSV behind.
+    """
+    total = table_row_count(start, end, step)
+    row_format = ",".join([f"%.{table_x_decimals(step)}f"] + ["%.10f"] * len(functions)) + "\n"
+    
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                             prefix=".", suffix=".csv.tmp")
+    try:
+        with os.fdopen(descriptor, "w", newline="") as csv_file:
+            csv.writer(csv_file, lineterminator="\n").writerow(["x"] + [f"{name}(x)" for name, expr in functions])
+            for first_row in range(0, total, chunk_size):
+                check_cancelled(cancelled)
+                count = min(chunk_size, total - first_row)
+                x, ys = table_values(functions, start, step, first_row, count)
+                
+                # One string-format call per chunk; only undefined values print as nan
+                values = np.column_stack([x] + ys).ravel().tolist()
+                csv_file.write(((row_format * count) % tuple(values)).replace("nan", "undefined"))
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return total
+
+
+def generate_function_name(used_names):
+    """Generate automatic function names: f, g, h, etc."""
+    base_names = ['f', 'g', 'h', 'i', 'j', 'k', 'l', 'm', 'n', 'p', 'q', 'r', 's', 't', 'u', 'v', 'w', 'z']
+    
+    for name in base_names:
+        if name not in used_names:
+            return name
+    
+    # If all single letters are used, use f1, f2, etc.
+    counter = 1
+    while f"f{counter}" in used_names:
+        counter += 1
+    return f"f{counter}"
+
+
+def parse_function_definition(func_str, used_names):
+    """Split 'CustomName = Function' (or a bare function) into (name, expression)
+    
+    Anything else containing '=', such as x**2 + y**2 = 25, is an implicit
+    equation and keeps the '=' in its expression.
+    """
+    func_str = func_str.strip()
+    if '=' in func_str:
+        custom_name, expression = func_str.split('=', 1)
+        custom_name = custom_name.strip()
+        if custom_name.isidentifier() and custom_name != 'x':
+            return custom_name, expression.strip()
+    return generate_function_name(used_names), func_str
+
+
+UNSAFE_FILE_CHARS = re.compile(r"[^\w.-]")
+
+
+def batch_range(job, key, number):
+    """An (low, high) axis range of a batch job; two finite, increasing numbers"""
+    value = job.get(key, (-10, 10))
+    if (not isinstance(value, (list, tuple)) or len(value) != 2
+            or not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value)
+            or not all(math.isfinite(v) for v in value) or value[0] >= value[1]):
+        raise ValueError(f"Plot {number}: {key} must be two finite, increasing numbers")
+    return float(value[0]), float(value[1])
+
+
+def batch_file_name(name, number):
+    """A job name made safe to use as a file name inside the output directory"""
+    if not isinstance(name, str):
+        raise ValueError(f"Plot {number}: name must be a string")
+    safe = UNSAFE_FILE_CHARS.sub("_", name).lstrip(".")
+    if not safe:
+        raise ValueError(f"Plot {number}: {name!r} cannot be used as a file name")
+    return safe
+
+
+def load_batch_file(path):
+    """Read plot jobs from a JSON file
+    
+    The file holds a list of objects such as
+    {"name": "trig", "functions": ["f = sin(x)", "cos(x)"],
+     "x_range": [-10, 10], "y_range": [-2, 2]}
+    where name and the ranges are optional. Names become file names, so
+    characters other than letters, digits, '-', '_' and '.' are replaced.
+    """
+    with open(path) as batch_file:
+        jobs = json.load(batch_file)
+    if not isinstance(jobs, list):
+        raise ValueError("Batch file must contain a list of plot definitions")
+    
+    prepared = []
+    names = set()
+    for number, job in enumerate(jobs):
+        if not isinstance(job, dict):
+            raise ValueError(f"Plot {number}: expected an object, got {type(job).__name__}")
+        func_strs = job.get("functions", [])
+        if not isinstance(func_strs, list) or not all(isinstance(f, str) for f in func_strs):
+            raise ValueError(f"Plot {number}: functions must be a list of strings")
+        name = batch_file_name(job.get("name", f"plot_{number:04d}"), number)
+        if name.casefold() in names:
+            raise ValueError(f"Plot {number}: duplicate name {name!r}")
+        names.add(name.casefold())
+        
+        functions = []
+        for func_str in func_strs:
+            func_name, expression = parse_function_definition(func_str, [f[0] for f in functions])
+            compile_curve(expression)  # Fail before any work is farmed out
+            functions.append((func_name, expression))
+        prepared.append({
+            "name": name,
+            "functions": functions,
+            "x_range": batch_range(job, "x_range", number),
+            "y_range": batch_range(job, "y_range", number)
+        })
+    return prepared
+
+
+def render_plot(functions, x_range, y_range, path, dpi=100):
+    """Render (name, expression) functions to an image file with the Agg backend"""
+    fig = Figure(figsize=(8, 6))
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    
+    renderer = FunctionRenderer(ax, canvas, blit=False)
+    renderer.setup_axes(*x_range, *y_range)
+    renderer.set_labels([function_label(name, expr) for name, expr in functions])
+    width, height = renderer.pixel_size()
+    for index, (name, expr) in enumerate(functions):
+        x, y, decimate = sample_curve(compile_curve(expr), *x_range, *y_range, width, height)
+        renderer.set_data(index, x, y, decimate)
+        
+    fig.savefig(path, dpi=dpi)
+    return path
+
+
+def render_job(job, output_dir, image_format, dpi):
+    """Process-pool entry point: render one prepared batch job"""
+    path = os.path.join(output_dir, f"{job['name']}.{image_format}")
+    return render_plot(job["functions"], job["x_range"], job["y_range"], path, dpi)
+
+
+def render_batch(jobs, output_dir, image_format="png", dpi=100, processes=None):
+    """Render many plots in parallel, one job per task; returns the written paths"""
+    os.makedirs(output_dir, exist_ok=True)
+    processes = processes or os.cpu_count() or 1
+    chunksize = max(1, len(jobs) // (processes * 4))
+    
+    if processes == 1:
+        return [render_job(job, output_dir, image_format, dpi) for job in jobs]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(render_job, jobs, [output_dir] * len(jobs),
+                                 [image_format] * len(jobs), [dpi] * len(jobs),
+                                 chunksize=chunksize))
+
+
+class VirtualTable:
+    """Treeview that only ever holds the rows currently on screen"""
+    
+    ROW_HEIGHT = 20
+    
+    def __init__(self, parent, functions):
+        self.functions = functions
+        self.start, self.step, self.total = 0.0, 1.0, 0
+        self.first_row = 0
+        self.visible_rows = TABLE_DEFAULT_ROWS
+        
+        frame = ttk.Frame(parent)
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        self.tree = ttk.Treeview(frame, height=self.visible_rows)
+        self.tree["columns"] = ["x"] + [f"{func[0]}(x)" for func in functions]
+        
+        self.tree.column("#0", width=0, stretch=tk.NO)
+        self.tree.column("x", anchor=tk.CENTER, width=100)
+        for func in functions:
+            self.tree.column(f"{func[0]}(x)", anchor=tk.CENTER, width=100)
+            
+        self.tree.heading("#0", text="")
+        self.tree.heading("x", text="x")
+        for func in functions:
+            self.tree.heading(f"{func[0]}(x)", text=f"{func[0]}(x)")
+            
+        # The scrollbar tracks our row window, not the Treeview's own contents
+        self.scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=self.on_scroll)
+        
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        self.tree.bind("<Configure>", self.on_resize)
+        self.tree.bind("<MouseWheel>", lambda event: self.scroll_by(-1 if event.delta > 0 else 1))
+        self.tree.bind("<Button-4>", lambda event: self.scroll_by(-1))
+        self.tree.bind("<Button-5>", lambda event: self.scroll_by(1))
+        
+    def set_range(self, start, end, step):
+        """Show the table x = start, start + step, ..., end from the top"""
+        self.start, self.step = start, step
+        self.total = table_row_count(start, end, step)
+        self.first_row = 0
+        self.show_rows()
+        
+    def show_rows(self):
+        """Compute and insert just the visible rows"""
+        max_first = max(0, self.total - self.visible_rows)
+        self.first_row = min(max(0, self.first_row), max_first)
+        count = min(self.visible_rows, self.total - self.first_row)
+        
+        self.tree.delete(*self.tree.get_children())
+        columns = table_columns(self.functions, self.start, self.step, self.first_row, count)
+        for row in zip(*columns):
+            self.tree.insert("", tk.END, values=list(row))
+            
+        if self.total:
+            self.scrollbar.set(self.first_row / self.total,
+                               (self.first_row + count) / self.total)
+                               
+    def scroll_by(self, rows):
+        self.first_row += rows
+        self.show_rows()
+        
+    def on_scroll(self, action, amount, unit=None):
+        """Scrollbar callback: 'moveto fraction' or 'scroll n units|pages'"""
+        if action == "moveto":
+            self.first_row = int(float(amount) * self.total)
+        elif unit == "pages":
+            self.first_row += int(amount) * self.visible_rows
+        else:
+            self.first_row += int(amount)
+        self.show_rows()
+        
+    def on_resize(self, event):
+        """Fit the number of computed rows to the window height"""
+        rows = max(1, event.height // self.ROW_HEIGHT - 1)
+        if rows != self.visible_rows:
+            self.visible_rows = rows
+            self.tree.configure(height=rows)
+            self.show_rows()
+
+
 class GraphingCalculator:
     def __init__(self):
         self.root = tk.Tk()
@@ -17,6 +1116,9 @@ class GraphingCalculator:
         self.functions = []  # List of (name, expression) tuples
         self.x_min, self.x_max = -10, 10
         self.y_min, self.y_max = -10, 10
+        self.sample_cache = SampleCache()  # Reused across zoom, pan and redraws
+        self.worker = EvaluationWorker(self.root)
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
         
         self.setup_ui()
         self.create_plot()
@@ -39,6 +1141,7 @@ class GraphingCalculator:
         func_frame.pack(fill=tk.X, pady=(0, 10))
         
         ttk.Label(func_frame, text="Enter function (e.g., x**2, sin(x), 2*x+1):").pack(anchor=tk.W)
+        ttk.Label(func_frame, text="Also x**2 + y**2 = 25 or (cos(t), sin(t), 0, 2*pi)").pack(anchor=tk.W)
         self.func_entry = ttk.Entry(func_frame, width=30)
         self.func_entry.pack(fill=tk.X, pady=(0, 5))
         
@@ -105,7 +1208,8 @@ class GraphingCalculator:
         
         ttk.Button(features_frame, text="Show Table", command=self.create_table).pack(fill=tk.X, pady=(0, 5))
         ttk.Button(features_frame, text="Solve System", command=self.solve_system_dialog).pack(fill=tk.X, pady=(0, 5))
-        ttk.Button(features_frame, text="Solve Quadratic", command=self.solve_quadratic_dialog).pack(fill=tk.X)
+        ttk.Button(features_frame, text="Solve Quadratic", command=self.solve_quadratic_dialog).pack(fill=tk.X, pady=(0, 5))
+        ttk.Button(features_frame, text="Find Roots & Intersections", command=self.find_roots).pack(fill=tk.X)
         
         # Graph canvas
         self.fig = Figure(figsize=(8, 6))
@@ -115,79 +1219,40 @@ class GraphingCalculator:
         
     def create_plot(self):
         """Create the initial plot with grid and axes"""
-        self.ax.clear()
-        self.ax.grid(True, alpha=0.3)
-        self.ax.axhline(y=0, color='k', linewidth=0.5)
-        self.ax.axvline(x=0, color='k', linewidth=0.5)
-        self.ax.set_xlim(self.x_min, self.x_max)
-        self.ax.set_ylim(self.y_min, self.y_max)
-        self.ax.set_xlabel('x')
-        self.ax.set_ylabel('y')
-        self.ax.set_title('Graphing Calculator')
-        self.canvas.draw()
-        
-    def safe_eval(self, expr, x):
-        """Safely evaluate mathematical expressions"""
-        # Replace x with the actual value
-        expr = expr.replace('x', f'({x})')
-        
-        # Add common math functions
-        safe_dict = {
-            'sin': math.sin, 'cos': math.cos, 'tan': math.tan,
-            'asin': math.asin, 'acos': math.acos, 'atan': math.atan,
-            'sinh': math.sinh, 'cosh': math.cosh, 'tanh': math.tanh,
-            'sqrt': math.sqrt, 'log': math.log, 'log10': math.log10,
-            'exp': math.exp, 'abs': abs, 'pi': math.pi, 'e': math.e,
-            'floor': math.floor, 'ceil': math.ceil, 'round': round
-        }
+        self.renderer = FunctionRenderer(self.ax, self.canvas)
+        self.renderer.setup_axes(self.x_min, self.x_max, self.y_min, self.y_max)
+        self.renderer.redraw()
         
-        try:
-            return eval(expr, {"__builtins__": {}}, safe_dict)
-        except:
-            return None
-            
     def add_function(self):
         """Add a function to the list"""
         func_str = self.func_entry.get().strip()
         if func_str:
-            # Check if user provided a custom name (format: CustomName = Function)
-            if '=' in func_str:
-                parts = func_str.split('=', 1)
-                if len(parts) == 2:
-                    custom_name = parts[0].strip()
-                    expression = parts[1].strip()
-                    func_name = custom_name
-                else:
-                    # Invalid format, treat as regular function
-                    expression = func_str
-                    func_name = self.generate_function_name()
-            else:
-                # No custom name, generate automatic name
-                expression = func_str
-                func_name = self.generate_function_name()
+            # Custom names use the format CustomName = Function
+            func_name, expression = parse_function_definition(
+                func_str, [func[0] for func in self.functions])
+            
+            try:
+                compile_curve(expression)
+            except ValueError as error:
+                messagebox.showerror("Error", str(error))
+                return
             
             # Add function as (name, expression) tuple
             self.functions.append((func_name, expression))
-            display_text = f"{func_name}(x) = {expression}"
+            display_text = function_label(func_name, expression)
             self.func_listbox.insert(tk.END, display_text)
             self.func_entry.delete(0, tk.END)
-            self.plot_functions()
+            
+            # Only the new curve is sampled; the others keep their artists
+            self.renderer.clear_annotations()
+            line = self.renderer.add_line(display_text)
+            self.request_samples(line, [len(self.functions) - 1])
+            self.renderer.refresh()
     
-    def generate_function_name(self):
-        """Generate automatic function names: f, g, h, etc."""
-        used_names = [func[0] for func in self.functions]
-        base_names = ['f', 'g', 'h', 'i', 'j', 'k', 'l', 'm', 'n', 'p', 'q', 'r', 's', 't', 'u', 'v', 'w', 'z']
-        
-        for name in base_names:
-            if name not in used_names:
-                return name
+    def explicit_functions(self):
+        """The functions of the form y = f(x)"""
+        return [func for func in self.functions if curve_kind(func[1]) == 'explicit']
         
-        # If all single letters are used, use f1, f2, etc.
-        counter = 1
-        while f"f{counter}" in used_names:
-            counter += 1
-        return f"f{counter}"
-    
     def remove_function(self):
         """Remove the selected function"""
         selection = self.func_listbox.curselection()
@@ -195,7 +1260,10 @@ class GraphingCalculator:
             index = selection[0]
             self.functions.pop(index)
             self.func_listbox.delete(index)
-            self.plot_functions()
+            self.worker.cancel(self.renderer.lines[index])
+            self.renderer.clear_annotations()
+            self.renderer.remove_line(index)
+            self.renderer.refresh()
         else:
             messagebox.showwarning("Warning", "Please select a function to remove.")
             
@@ -203,39 +1271,56 @@ class GraphingCalculator:
         """Clear all functions"""
         self.functions.clear()
         self.func_listbox.delete(0, tk.END)
-        self.create_plot()
+        self.worker.cancel_all()
+        self.renderer.clear_annotations()
+        self.renderer.set_labels([])
+        self.renderer.refresh()
+        
+    def request_samples(self, channel, indices):
+        """Sample some functions off the Tk thread and update their artists when done"""
+        view = (self.x_min, self.x_max, self.y_min, self.y_max, *self.renderer.pixel_size())
+        targets = [(self.renderer.lines[i], self.functions[i][1]) for i in indices]
+        cache = self.sample_cache
+        
+        def job(cancelled):
+            results = []
+            for line, func_str in targets:
+                check_cancelled(cancelled)
+                try:
+                    curve = compile_curve(func_str)
+                except ValueError:
+                    results.append((line, [], [], False))
+                    continue
+                # NaN entries (undefined points and poles) leave gaps in the plotted line
+                results.append((line, *sample_curve(curve, *view, cache, cancelled)))
+            return results
+        
+        self.worker.submit(channel, job, self.show_samples,
+                           lambda error: messagebox.showerror("Error", f"Could not plot: {error}"))
+        
+    def show_samples(self, results):
+        """Apply finished samples (on the Tk thread) and repaint the curves"""
+        for line, x, y, decimate in results:
+            if line in self.renderer.lines:
+                self.renderer.set_line_data(line, x, y, decimate)
+        self.renderer.refresh()
         
     def plot_functions(self):
         """Plot all functions"""
-        self.create_plot()
-        
-        if not self.functions:
-            return
-            
-        x = np.linspace(self.x_min, self.x_max, 1000)
-        colors = ['blue', 'red', 'green', 'orange', 'purple', 'brown', 'pink', 'gray']
-        
-        for i, (func_name, func_str) in enumerate(self.functions):
-            y = []
-            for x_val in x:
-                y_val = self.safe_eval(func_str, x_val)
-                if y_val is not None and not math.isnan(y_val) and not math.isinf(y_val):
-                    y.append(y_val)
-                else:
-                    y.append(None)
-            
-            # Filter out None values
-            valid_points = [(x[j], y[j]) for j in range(len(x)) if y[j] is not None]
-            if valid_points:
-                x_plot, y_plot = zip(*valid_points)
-                color = colors[i % len(colors)]
-                self.ax.plot(x_plot, y_plot, color=color, linewidth=2, label=f'{func_name}(x) = {func_str}')
+        # Anything still sampling the previous view is now wasted work
+        self.worker.cancel_all()
+        self.renderer.clear_annotations()
+        self.renderer.set_labels([function_label(name, expr) for name, expr in self.functions])
+        view_changed = self.renderer.set_view(self.x_min, self.x_max, self.y_min, self.y_max)
         
         if self.functions:
-            self.ax.legend()
-        self.canvas.draw()
-        
-
+            self.request_samples('view', range(len(self.functions)))
+            
+        # Existing curves are redrawn in the new view until the fresh samples arrive
+        if view_changed:
+            self.renderer.redraw()
+        else:
+            self.renderer.refresh()
         
     def zoom_in(self):
         """Zoom in on the graph"""
@@ -284,17 +1369,33 @@ class GraphingCalculator:
     def update_range(self):
         """Update the view range from entry fields"""
         try:
-            self.x_min = float(self.x_min_entry.get())
-            self.x_max = float(self.x_max_entry.get())
-            self.y_min = float(self.y_min_entry.get())
-            self.y_max = float(self.y_max_entry.get())
-            self.plot_functions()
+            x_min = float(self.x_min_entry.get())
+            x_max = float(self.x_max_entry.get())
+            y_min = float(self.y_min_entry.get())
+            y_max = float(self.y_max_entry.get())
         except ValueError:
             messagebox.showerror("Error", "Please enter valid numbers for the range.")
+            return
+            
+        # float() accepts "inf" and "nan", NaN fails every comparison below, and a
+        # span such as -1e308 to 1e308 overflows even though both ends are finite
+        if not all(map(math.isfinite, (x_min, x_max, y_min, y_max, x_max - x_min, y_max - y_min))):
+            messagebox.showerror("Error", "The range must be finite and not too wide.")
+            return
+            
+        if x_min >= x_max or y_min >= y_max:
+            messagebox.showerror("Error", "Each range minimum must be less than its maximum.")
+            return
+            
+        self.x_min, self.x_max = x_min, x_max
+        self.y_min, self.y_max = y_min, y_max
+        self.plot_functions()
             
     def create_table(self):
         """Create a table of (x,y) values"""
-        if not self.functions:
+        # Implicit and parametric curves have no single y for each x
+        functions = self.explicit_functions()
+        if not functions:
             messagebox.showwarning("Warning", "No functions to create table for.")
             return
             
@@ -310,39 +1411,61 @@ class GraphingCalculator:
         except ValueError:
             start_x, end_x = -10, 10
             
+        # Range and step controls
+        controls = ttk.Frame(table_window)
+        controls.pack(fill=tk.X, padx=5, pady=5)
+        entries = {}
+        for label, value in (("Start:", start_x), ("End:", end_x),
+                             ("Step:", (end_x - start_x) / (TABLE_DEFAULT_ROWS - 1))):
+            ttk.Label(controls, text=label).pack(side=tk.LEFT)
+            entry = ttk.Entry(controls, width=10)
+            entry.pack(side=tk.LEFT, padx=(0, 5))
+            entry.insert(0, f"{value:g}")
+            entries[label] = entry
+            
         # Create table
-        tree = ttk.Treeview(table_window)
-        tree["columns"] = ["x"] + [f"{func[0]}(x)" for func in self.functions]
+        table = VirtualTable(table_window, functions)
         
-        tree.column("#0", width=0, stretch=tk.NO)
-        tree.column("x", anchor=tk.CENTER, width=100)
-        for func in self.functions:
-            tree.column(f"{func[0]}(x)", anchor=tk.CENTER, width=100)
-            
-        tree.heading("#0", text="")
-        tree.heading("x", text="x")
-        for func in self.functions:
-            tree.heading(f"{func[0]}(x)", text=f"{func[0]}(x)")
-            
-        # Generate table data
-        x_values = np.linspace(start_x, end_x, 21)  # 21 points
-        
-        for x_val in x_values:
-            row = [f"{x_val:.2f}"]
-            for func_name, func_str in self.functions:
-                y_val = self.safe_eval(func_str, x_val)
-                if y_val is not None and not math.isnan(y_val) and not math.isinf(y_val):
-                    row.append(f"{y_val:.4f}")
-                else:
-                    row.append("undefined")
-            tree.insert("", tk.END, values=row)
+        def read_range():
+            try:
+                start = float(entries["Start:"].get())
+                end = float(entries["End:"].get())
+                step = float(entries["Step:"].get())
+            except ValueError:
+                messagebox.showerror("Error", "Please enter valid numbers.", parent=table_window)
+                return None
+            if step <= 0 or end < start:
+                messagebox.showerror("Error", "Step must be positive and End must not be less than Start.",
+                                     parent=table_window)
+                return None
+            return start, end, step
             
-        # Add scrollbar
-        scrollbar = ttk.Scrollbar(table_window, orient=tk.VERTICAL, command=tree.yview)
-        tree.configure(yscrollcommand=scrollbar.set)
+        def update_table():
+            table_range = read_range()
+            if table_range:
+                table.set_range(*table_range)
+                
+        def export_csv():
+            table_range = read_range()
+            if not table_range:
+                return
+            path = filedialog.asksaveasfilename(parent=table_window, defaultextension=".csv",
+                                                filetypes=[("CSV files", "*.csv")])
+            if not path:
+                return
+            # Large exports stream in the background so the window stays usable; they are
+            # detached so zooming or panning the graph meanwhile does not cancel them
+            self.worker.submit(("export", path),
+                               lambda cancelled: export_table_csv(path, functions, *table_range,
+                                                                  cancelled=cancelled),
+                               lambda rows: messagebox.showinfo("Export", f"Wrote {rows} rows to {path}"),
+                               lambda error: messagebox.showerror("Export", f"Could not write {path}: {error}"),
+                               detached=True)
+                               
+        ttk.Button(controls, text="Update", command=update_table).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(controls, text="Export CSV", command=export_csv).pack(side=tk.LEFT)
         
-        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        update_table()
         
     def solve_system_dialog(self):
         """Dialog for solving system of equations"""
@@ -400,9 +1523,8 @@ class GraphingCalculator:
                 self.plot_functions()
                 
                 # Mark intersection point
-                self.ax.plot(x_solution, y_solution, 'ro', markersize=8, label=f'Solution: ({x_solution:.3f}, {y_solution:.3f})')
-                self.ax.legend()
-                self.canvas.draw()
+                self.renderer.add_marker(x_solution, y_solution, f'Solution: ({x_solution:.3f}, {y_solution:.3f})')
+                self.renderer.refresh()
                 
                 messagebox.showinfo("Solution", f"Intersection point: ({x_solution:.3f}, {y_solution:.3f})")
                 dialog.destroy()
@@ -412,6 +1534,32 @@ class GraphingCalculator:
                 
         ttk.Button(dialog, text="Solve and Graph", command=solve_and_graph).pack(pady=20)
         
+    def find_roots(self):
+        """Mark every root and intersection of the graphed functions in view"""
+        functions = self.explicit_functions()
+        if not functions:
+            messagebox.showwarning("Warning", "No functions to find roots for.")
+            return
+            
+        roots, intersections = find_roots_and_intersections(functions, self.x_min, self.x_max)
+        
+        self.renderer.clear_annotations()
+        if roots:
+            self.renderer.add_marker([r[1] for r in roots], [0] * len(roots), 'Roots')
+        if intersections:
+            self.renderer.add_marker([i[2] for i in intersections], [i[3] for i in intersections],
+                                     'Intersections', style='ks')
+        self.renderer.refresh()
+        
+        lines = [f"{name}(x) = 0 at x = {x:.6f}" for name, x in roots]
+        lines += [f"{a}(x) = {b}(x) at ({x:.6f}, {y:.6f})" for a, b, x, y in intersections]
+        if not lines:
+            messagebox.showinfo("Roots & Intersections", "No roots or intersections in the current view.")
+            return
+        if len(lines) > 30:
+            lines = lines[:30] + [f"... and {len(lines) - 30} more"]
+        messagebox.showinfo("Roots & Intersections", "\n".join(lines))
+        
     def solve_quadratic_dialog(self):
         """Dialog for solving quadratic equations"""
         dialog = tk.Toplevel(self.root)
@@ -475,12 +1623,11 @@ class GraphingCalculator:
                 # Mark real roots if they exist
                 if discriminant >= 0:
                     if discriminant > 0:
-                        self.ax.plot(x1, 0, 'ro', markersize=8, label=f'Root 1: ({x1:.3f}, 0)')
-                        self.ax.plot(x2, 0, 'ro', markersize=8, label=f'Root 2: ({x2:.3f}, 0)')
+                        self.renderer.add_marker(x1, 0, f'Root 1: ({x1:.3f}, 0)')
+                        self.renderer.add_marker(x2, 0, f'Root 2: ({x2:.3f}, 0)')
                     else:
-                        self.ax.plot(x1, 0, 'ro', markersize=8, label=f'Root: ({x1:.3f}, 0)')
-                    self.ax.legend()
-                    self.canvas.draw()
+                        self.renderer.add_marker(x1, 0, f'Root: ({x1:.3f}, 0)')
+                    self.renderer.refresh()
                 
                 messagebox.showinfo("Solution", roots_text)
                 dialog.destroy()
@@ -493,8 +1640,39 @@ class GraphingCalculator:
     def run(self):
         """Start the graphing calculator"""
         self.root.mainloop()
+        
+    def close(self):
+        """Stop background evaluation and close the window"""
+        self.worker.shutdown()
+        self.root.destroy()
 
-if __name__ == "__main__":
+def main():
+    parser = argparse.ArgumentParser(description="Graphing Calculator")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="render the plots defined in a JSON file instead of opening the window")
+    parser.add_argument("--output-dir", default="plots", help="where batch images are written")
+    parser.add_argument("--format", default="png", choices=["png", "svg", "pdf"],
+                        help="image format for batch output")
+    parser.add_argument("--dpi", type=int, default=100, help="resolution of raster output")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="worker processes for batch rendering (default: all cores)")
+    args = parser.parse_args()
+    
+    if args.batch:
+        try:
+            jobs = load_batch_file(args.batch)
+        except (OSError, ValueError) as error:
+            parser.error(str(error))
+        start = time.perf_counter()
+        paths = render_batch(jobs, args.output_dir, args.format, args.dpi, args.processes)
+        elapsed = time.perf_counter() - start
+        print(f"Rendered {len(paths)} plots to {args.output_dir} in {elapsed:.2f}s")
+        return
+        
     # Create and run the graphing calculator
     calculator = GraphingCalculator()
     calculator.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,301 @@
-text = 'mrttaqrhknsw ih puggrur'
-custom_key = 'python'
-
-def vigenere(message, key, direction=1):
-    key_index = 0
-    alphabet = 'abcdefghijklmnopqrstuvwxyz'
-    final_message = ''
-
-    for char in message.lower():
-
-        # Append any non-letter character to the message
-        if not char.isalpha():
-            final_message += char
-        else:        
-            # Find the right key character to encode/decode
-            key_char = key[key_index % len(key)]
-            key_index += 1
-
-            # Define the offset and the encrypted/decrypted letter
-            offset = alphabet.index(key_char)
-            index = alphabet.find(char)
-            new_index = (index + offset*direction) % len(alphabet)
-            final_message += alphabet[new_index]
-    
-    return final_message
-
-def encrypt(message, key):
-    return vigenere(message, key)
-    
-def decrypt(message, key):
-    return vigenere(message, key, -1)
-
-print(f'\nEncrypted text: {text}')
-print(f'Key: {custom_key}')
-decryption = decrypt(text, custom_key)
-print(f'\nDecrypted text: {decryption}\n')
\ No newline at end of file
+import argparse
+import contextlib
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import numpy as np
+
+text = 'mrttaqrhknsw ih puggrur'
+custom_key = 'python'
+
+alphabet = 'abcdefghijklmnopqrstuvwxyz'
+LOWER_A, LOWER_Z = ord('a'), ord('z')
+CHUNK_SIZE = 4 * 1024 * 1024  # bytes held in memory at a time when streaming files
+SEGMENT_SIZE = 8 * 1024 * 1024  # bytes per task when encrypting a file in parallel
+CRACK_SAMPLE_SIZE = 4 * 1024 * 1024  # ciphertext bytes read when recovering a key
+MAX_KEY_LENGTH = 20
+
+# Relative letter frequencies of English text, a to z
+ENGLISH_FREQUENCIES = np.array([
+    8.167, 1.492, 2.782, 4.253, 12.702, 2.228, 2.015, 6.094, 6.966, 0.153, 0.772, 4.025, 2.406,
+    6.749, 7.507, 1.929, 0.095, 5.987, 6.327, 9.056, 2.758, 0.978, 2.360, 0.150, 1.974, 0.074
+]) / 100
+ENGLISH_IC = float(np.sum(ENGLISH_FREQUENCIES ** 2))  # about 0.066
+RANDOM_IC = 1 / 26
+
+def key_offsets(key):
+    # Same lookup as before, so characters outside the alphabet still raise ValueError
+    if any(key_char not in alphabet for key_char in key):
+        raise ValueError(f'key may only contain the letters a-z: {key!r}')
+    return np.array([alphabet.index(key_char) for key_char in key], dtype=np.int64)
+
+def shift_table(key, direction=1):
+    # Row k maps every byte to its output under key letter k; non-letters map to themselves
+    shifts = (key_offsets(key) * direction) % len(alphabet)
+    table = np.tile(np.arange(256, dtype=np.uint8), (len(shifts), 1))
+    letters = np.arange(len(alphabet))
+    table[:, LOWER_A:LOWER_Z + 1] = (letters[np.newaxis, :] + shifts[:, np.newaxis]) % len(alphabet) + LOWER_A
+    return table
+
+def vigenere_array(codes, key, direction=1, key_start=0):
+    # codes: uint8 array of lowercase ASCII; key_start: letters already consumed
+    table = shift_table(key, direction)
+    is_letter = (codes >= LOWER_A) & (codes <= LOWER_Z)
+
+    # The n-th letter of the message uses key[n % len(key)]
+    key_start %= len(key)
+    dtype = np.int32 if len(codes) + len(key) < 2**31 else np.int64
+    key_position = np.cumsum(is_letter, dtype=dtype)
+    key_position += key_start - 1
+    key_position %= len(key)
+
+    # One gather from the flattened table does every shift at once
+    key_position *= 256
+    key_position += codes
+    return table.ravel()[key_position]
+
+def vigenere_scalar(message, key, direction=1):
+    key_index = 0
+    final_message = []
+
+    for char in message.lower():
+
+        # Append any non-letter character to the message
+        if not char.isalpha():
+            final_message.append(char)
+        else:
+            # Find the right key character to encode/decode
+            key_char = key[key_index % len(key)]
+            key_index += 1
+
+            # Define the offset and the encrypted/decrypted letter
+            offset = alphabet.index(key_char)
+            index = alphabet.find(char)
+            new_index = (index + offset*direction) % len(alphabet)
+            final_message.append(alphabet[new_index])
+
+    return ''.join(final_message)
+
+def vigenere(message, key, direction=1):
+    message = message.lower()
+
+    # Non-ASCII letters keep their old (character by character) treatment
+    if not message.isascii() or not key:
+        return vigenere_scalar(message, key, direction)
+
+    codes = np.frombuffer(message.encode('ascii'), dtype=np.uint8)
+    return vigenere_array(codes, key, direction).tobytes().decode('ascii')
+
+def encrypt(message, key):
+    return vigenere(message, key)
+
+def decrypt(message, key):
+    return vigenere(message, key, -1)
+
+def count_letters(codes):
+    return int(np.count_nonzero((codes >= LOWER_A) & (codes <= LOWER_Z)))
+
+def vigenere_stream(source, destination, key, direction=1, chunk_size=CHUNK_SIZE):
+    # Binary file objects in and out; only one chunk is in memory at a time.
+    # ASCII letters are lowercased and shifted, every other byte passes through.
+    key_start = 0
+    total = 0
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        codes = np.frombuffer(chunk.lower(), dtype=np.uint8)
+        destination.write(vigenere_array(codes, key, direction, key_start).tobytes())
+
+        # The next chunk continues from wherever the key stopped
+        key_start = (key_start + count_letters(codes)) % len(key)
+        total += len(chunk)
+    return total
+
+def open_stream(path, mode):
+    # '-' means standard input/output (left open) so the cipher can sit in a pipeline
+    if path == '-':
+        return contextlib.nullcontext(sys.stdin.buffer if 'r' in mode else sys.stdout.buffer)
+    return open(path, mode)
+
+def vigenere_file(input_path, output_path, key, direction=1, chunk_size=CHUNK_SIZE):
+    # Reject a bad key before creating the output file
+    if not key:
+        raise ValueError('key must contain at least one letter')
+    key_offsets(key)
+
+    with open_stream(input_path, 'rb') as source, open_stream(output_path, 'wb') as destination:
+        return vigenere_stream(source, destination, key, direction, chunk_size)
+
+def read_segment(path, offset, length):
+    with open(path, 'rb') as source:
+        source.seek(offset)
+        return np.frombuffer(source.read(length).lower(), dtype=np.uint8)
+
+def count_segment_letters(path, offset, length):
+    return count_letters(read_segment(path, offset, length))
+
+def encrypt_segment(input_path, output_path, offset, length, key, direction, key_start):
+    # Each byte maps to exactly one byte, so a segment lands at its own offset
+    result = vigenere_array(read_segment(input_path, offset, length), key, direction, key_start)
+    with open(output_path, 'r+b') as destination:
+        destination.seek(offset)
+        destination.write(result.tobytes())
+    return length
+
+def vigenere_file_parallel(input_path, output_path, key, direction=1, processes=None,
+                           segment_size=SEGMENT_SIZE):
+    # Same output as vigenere_file, computed by a process pool in two passes
+    if not key:
+        raise ValueError('key must contain at least one letter')
+    key_offsets(key)
+
+    size = os.path.getsize(input_path)
+    offsets = list(range(0, size, segment_size))
+    lengths = [min(segment_size, size - offset) for offset in offsets]
+    with open(output_path, 'wb') as destination:
+        destination.truncate(size)
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        # Pass 1: letters per segment; their prefix sums say where the key starts in each
+        counts = list(executor.map(count_segment_letters, repeat(input_path), offsets, lengths))
+        key_starts = (np.cumsum([0] + counts[:-1]) % len(key)).tolist()
+
+        # Pass 2: every segment is independent once its key position is known
+        list(executor.map(encrypt_segment, repeat(input_path), repeat(output_path), offsets,
+                          lengths, repeat(key), repeat(direction), key_starts))
+    return size
+
+def letter_indices(message):
+    # Just the letters of a message (str or bytes), as 0..25
+    if isinstance(message, str):
+        message = message.lower().encode('ascii', 'ignore')
+    codes = np.frombuffer(message.lower(), dtype=np.uint8)
+    return codes[(codes >= LOWER_A) & (codes <= LOWER_Z)] - LOWER_A
+
+def column_counts(letters, key_length):
+    # counts[j, c]: how often letter c sits at a position n with n % key_length == j
+    columns = np.arange(len(letters)) % key_length
+    counts = np.bincount(columns * 26 + letters, minlength=key_length * 26)
+    return counts.reshape(key_length, 26)
+
+def index_of_coincidence(letters, max_key_length=MAX_KEY_LENGTH):
+    # Mean index of coincidence of the columns for every key length 1..max_key_length;
+    # close to English (0.066) when the columns each use a single key letter
+    scores = np.zeros(max_key_length + 1)
+    for key_length in range(1, max_key_length + 1):
+        counts = column_counts(letters, key_length).astype(np.float64)
+        sizes = counts.sum(axis=1)
+        valid = sizes > 1
+        coincidences = (counts * (counts - 1)).sum(axis=1)
+        scores[key_length] = np.mean(coincidences[valid] / (sizes[valid] * (sizes[valid] - 1)))
+    return scores
+
+def kasiski(letters, max_key_length=MAX_KEY_LENGTH):
+    # Distances between repeated trigrams tend to be multiples of the key length.
+    # Returns, per key length, the share of distances it divides beyond what chance gives.
+    scores = np.zeros(max_key_length + 1)
+    if len(letters) < 3:
+        return scores
+    letters = letters.astype(np.int64)
+    trigrams = letters[:-2] * 676 + letters[1:-1] * 26 + letters[2:]
+
+    # A stable sort groups equal trigrams with their positions still in order
+    order = np.argsort(trigrams, kind='stable')
+    repeated = trigrams[order][1:] == trigrams[order][:-1]
+    distances = (order[1:] - order[:-1])[repeated]
+    if len(distances) == 0:
+        return scores
+    for key_length in range(2, max_key_length + 1):
+        divisible = np.count_nonzero(distances % key_length == 0) / len(distances)
+        scores[key_length] = max(0.0, divisible - 1 / key_length)
+    return scores
+
+def rank_key_lengths(letters, max_key_length=MAX_KEY_LENGTH):
+    # Best key lengths first. Multiples of the true length score as well as the
+    # length itself on coincidence, so shorter lengths win ties.
+    max_key_length = max(1, min(max_key_length, len(letters) // 2))
+    coincidence = (index_of_coincidence(letters, max_key_length) - RANDOM_IC) / (ENGLISH_IC - RANDOM_IC)
+    scores = coincidence + 0.5 * kasiski(letters, max_key_length)
+    scores -= 0.01 * np.arange(max_key_length + 1)
+    lengths = np.arange(1, max_key_length + 1)
+    return lengths[np.argsort(-scores[1:], kind='stable')].tolist()
+
+def chi_squared_by_shift(letters, key_length):
+    # chi[j, s]: chi-squared of column j against English after undoing a shift of s
+    counts = column_counts(letters, key_length)
+    shifts = (np.arange(26)[:, np.newaxis] + np.arange(26)[np.newaxis, :]) % 26
+    observed = counts[:, shifts]  # observed[j, s, p]: count of plaintext p under shift s
+    expected = counts.sum(axis=1)[:, np.newaxis, np.newaxis] * ENGLISH_FREQUENCIES
+    return ((observed - expected) ** 2 / expected).sum(axis=2)
+
+def shortest_period(key):
+    # 'pythonpython' and 'python' encrypt identically
+    for period in range(1, len(key)):
+        if len(key) % period == 0 and key == key[:period] * (len(key) // period):
+            return key[:period]
+    return key
+
+def recover_keys(ciphertext, max_key_length=MAX_KEY_LENGTH, candidates=5):
+    # Ranked (key, score) candidates; lower scores (chi-squared per letter) are better
+    letters = letter_indices(ciphertext)
+    if len(letters) == 0:
+        return []
+
+    ranked = {}
+    for key_length in rank_key_lengths(letters, max_key_length)[:candidates]:
+        chi = chi_squared_by_shift(letters, key_length)
+        best = chi.argmin(axis=1)
+        key = shortest_period(''.join(alphabet[shift] for shift in best))
+        score = float(chi[np.arange(key_length), best].sum() / len(letters))
+        ranked[key] = min(score, ranked.get(key, score))
+    return sorted(ranked.items(), key=lambda item: item[1])
+
+def demo():
+    print(f'\nEncrypted text: {text}')
+    print(f'Key: {custom_key}')
+    decryption = decrypt(text, custom_key)
+    print(f'\nDecrypted text: {decryption}\n')
+
+def main():
+    parser = argparse.ArgumentParser(description='Vigenère cipher for text files of any size')
+    commands = parser.add_subparsers(dest='mode', required=True)
+    for mode in ('encrypt', 'decrypt'):
+        command = commands.add_parser(mode)
+        command.add_argument('input', help="file to read, or '-' for standard input")
+        command.add_argument('output', help="file to write, or '-' for standard output")
+        command.add_argument('--key', required=True, help='lowercase letters a-z')
+        command.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                             help='bytes processed per step (bounds memory use)')
+        command.add_argument('--processes', type=int, default=1,
+                             help='worker processes; more than 1 needs real files, not pipes')
+    command = commands.add_parser('crack', help='recover the key of an English ciphertext')
+    command.add_argument('input', help="file to read, or '-' for standard input")
+    command.add_argument('--max-key-length', type=int, default=MAX_KEY_LENGTH)
+    command.add_argument('--candidates', type=int, default=5, help='key lengths to try')
+    args = parser.parse_args()
+
+    try:
+        if args.mode == 'crack':
+            with open_stream(args.input, 'rb') as source:
+                sample = source.read(CRACK_SAMPLE_SIZE)
+            for rank, (key, score) in enumerate(recover_keys(sample, args.max_key_length,
+                                                             args.candidates), 1):
+                print(f'{rank}. {key} (chi-squared per letter: {score:.4f})')
+            return
+
+        direction = 1 if args.mode == 'encrypt' else -1
+        if args.processes > 1 and '-' not in (args.input, args.output):
+            vigenere_file_parallel(args.input, args.output, args.key, direction,
+                                   args.processes, args.chunk_size)
+        else:
+            vigenere_file(args.input, args.output, args.key, direction, args.chunk_size)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main()
+    else:
+        demo()
@@ -1,3 +1,54 @@
+import argparse
+import contextlib
+import csv
+import os
+import sys
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import compress
+import numpy as np
+
+ZERO = ord('0')
+BATCH_SIZE = 1_000_000  # card numbers scored per step, bounds temporary memory
+BLOCK_SIZE = 4 * 1024 * 1024  # bytes of a card file handled per task
+CARD_TRANSLATION = str.maketrans('', '', '- ')  # drops separators; fast path for ASCII text
+
+# Score of each byte as an undoubled (row 0) or doubled (row 1) digit; NUL padding scores 0
+LUHN_TABLE = np.zeros((2, 256), dtype=np.uint8)
+LUHN_TABLE[0, ZERO:ZERO + 10] = np.arange(10)
+LUHN_TABLE[1, ZERO:ZERO + 10] = [0, 2, 4, 6, 8, 1, 3, 5, 7, 9]
+ALLOWED_BYTES = np.zeros(256, dtype=bool)
+ALLOWED_BYTES[ZERO:ZERO + 10] = True
+ALLOWED_BYTES[0] = True
+
+IIN_DIGITS = 8  # leading digits that identify the issuer
+# (network, first prefix, last prefix, allowed lengths); overlapping ranges resolve to the narrowest
+DEFAULT_IIN_RANGES = [
+    ('American Express', '34', '34', [15]),
+    ('American Express', '37', '37', [15]),
+    ('Diners Club', '300', '305', range(14, 20)),
+    ('Diners Club', '36', '36', range(14, 20)),
+    ('Diners Club', '38', '39', range(14, 20)),
+    ('Discover', '6011', '6011', range(16, 20)),
+    ('Discover', '622126', '622925', range(16, 20)),
+    ('Discover', '644', '649', range(16, 20)),
+    ('Discover', '65', '65', range(16, 20)),
+    ('JCB', '3528', '3589', range(16, 20)),
+    ('Maestro', '5018', '5018', range(12, 20)),
+    ('Maestro', '5020', '5020', range(12, 20)),
+    ('Maestro', '5038', '5038', range(12, 20)),
+    ('Maestro', '5893', '5893', range(12, 20)),
+    ('Maestro', '6304', '6304', range(12, 20)),
+    ('Maestro', '6759', '6759', range(12, 20)),
+    ('Maestro', '6761', '6763', range(12, 20)),
+    ('Mastercard', '2221', '2720', [16]),
+    ('Mastercard', '51', '55', [16]),
+    ('Mir', '2200', '2204', range(16, 20)),
+    ('UnionPay', '62', '62', range(16, 20)),
+    ('Visa', '4', '4', [13, 16, 19]),
+]
+
 def verify_card_number(card_number):
     sum_of_odd_digits = 0
     card_number_reversed = card_number[::-1]
@@ -14,17 +65,319 @@ def verify_card_number(card_number):
             number = (number // 10) + (number % 10)
         sum_of_even_digits += number
     total = sum_of_odd_digits + sum_of_even_digits
-    print(total)
     return total % 10 == 0
 
-def main():
+def card_number_array(card_numbers):
+    # Fixed-width ASCII strings, left-aligned and NUL-padded; ints become their digits
+    if isinstance(card_numbers, np.ndarray) and card_numbers.dtype.kind == 'S':
+        return card_numbers
+    if not isinstance(card_numbers, (np.ndarray, list, tuple)):
+        card_numbers = list(card_numbers)
+    try:
+        return np.array(card_numbers, dtype='S').reshape(-1)
+    except UnicodeEncodeError:
+        # Non-ASCII characters become '?', which fails validation like any other non-digit
+        card_numbers = [str(number).encode('ascii', 'replace') for number in card_numbers]
+        return np.array(card_numbers, dtype='S').reshape(-1)
+
+def luhn_totals(matrix, lengths):
+    # Luhn sums of left-aligned rows of ASCII digits, each taken as a `lengths`-digit number.
+    # Counting from the right, every second digit is doubled: that is the even columns when
+    # the length is even and the odd columns when it is odd.
+    even_columns, odd_columns = matrix[:, 0::2], matrix[:, 1::2]
+    even_length_total = (LUHN_TABLE[1][even_columns].sum(axis=1, dtype=np.int32)
+                         + LUHN_TABLE[0][odd_columns].sum(axis=1, dtype=np.int32))
+    odd_length_total = (LUHN_TABLE[0][even_columns].sum(axis=1, dtype=np.int32)
+                        + LUHN_TABLE[1][odd_columns].sum(axis=1, dtype=np.int32))
+    return np.where(np.asarray(lengths) % 2 == 0, even_length_total, odd_length_total)
+
+def luhn_valid_matrix(matrix, lengths):
+    total = luhn_totals(matrix, lengths)
+    return (total % 10 == 0) & (lengths > 0) & ALLOWED_BYTES[matrix].all(axis=1)
+
+def luhn_valid_rows(codes):
+    matrix = codes.view(np.uint8).reshape(len(codes), codes.itemsize)
+    return luhn_valid_matrix(matrix, np.count_nonzero(matrix, axis=1))
+
+class IINIndex:
+    # Sorted, disjoint ranges of IIN_DIGITS-digit prefixes, searched with np.searchsorted
+
+    def __init__(self, ranges):
+        ranges = list(ranges)
+        self.networks = sorted({network for network, *_ in ranges})
+        lows = np.array([int(first.ljust(IIN_DIGITS, '0')[:IIN_DIGITS]) for _, first, _, _ in ranges],
+                        dtype=np.int64)
+        highs = np.array([int(last.ljust(IIN_DIGITS, '9')[:IIN_DIGITS]) for _, _, last, _ in ranges],
+                         dtype=np.int64)
+        if np.any(lows > highs):
+            raise ValueError('every IIN range must start at or before its end')
+        self.range_networks = np.array([self.networks.index(network) for network, *_ in ranges],
+                                       dtype=np.int16)
+        self.length_masks = np.array([sum(1 << length for length in lengths)
+                                      for *_, lengths in ranges], dtype=np.int64)
+
+        # Paint the ranges over the elementary intervals between their bounds, widest first,
+        # so that wherever ranges overlap the narrowest one is left on top
+        self.starts = np.unique(np.concatenate(([0], lows, highs + 1)))
+        self.range_ids = np.full(len(self.starts), -1, dtype=np.int32)
+        for range_id in np.argsort(lows - highs, kind='stable'):
+            first, stop = np.searchsorted(self.starts, [lows[range_id], highs[range_id] + 1])
+            self.range_ids[first:stop] = range_id
+
+    @classmethod
+    def from_csv(cls, path):
+        # Columns: network, first prefix, last prefix, lengths such as '16', '16-19' or '13;16;19'
+        ranges = []
+        with open(path, newline='') as table:
+            for row in csv.DictReader(table):
+                lengths = []
+                for part in row['lengths'].replace(';', ' ').split():
+                    first, _, last = part.partition('-')
+                    lengths.extend(range(int(first), int(last or first) + 1))
+                ranges.append((row['network'], row['first'], row['last'], lengths))
+        return cls(ranges)
+
+    def lookup(self, matrix, lengths):
+        # Network index (-1 when unknown) and whether the length suits that network
+        leading = np.zeros((len(matrix), IIN_DIGITS), dtype=np.int64)
+        width = min(IIN_DIGITS, matrix.shape[1])
+        leading[:, :width] = LUHN_TABLE[0][matrix[:, :width]]
+        keys = leading @ 10 ** np.arange(IIN_DIGITS - 1, -1, -1, dtype=np.int64)
+
+        range_ids = self.range_ids[np.searchsorted(self.starts, keys, side='right') - 1]
+        known = range_ids >= 0
+        networks = np.where(known, self.range_networks[range_ids], -1)
+        length_ok = ~known | ((self.length_masks[range_ids] >> lengths) & 1).astype(bool)
+        return networks, length_ok
+
+DEFAULT_IIN_INDEX = IINIndex(DEFAULT_IIN_RANGES)
+
+def verify_card_numbers(card_numbers, batch_size=BATCH_SIZE):
+    # Boolean mask of valid numbers; anything but the digits 0-9 makes a number invalid
+    codes = card_number_array(card_numbers)
+    valid = np.empty(len(codes), dtype=bool)
+    if codes.itemsize == 0:
+        valid[:] = False
+        return valid
+    for start in range(0, len(codes), batch_size):
+        valid[start:start + batch_size] = luhn_valid_rows(codes[start:start + batch_size])
+    return valid
+
+def classify_card_numbers(card_numbers, index=DEFAULT_IIN_INDEX, batch_size=BATCH_SIZE):
+    # Luhn check, network detection and length rules in one pass over each batch.
+    # Returns a boolean mask and network indices into index.networks (-1 when unknown).
+    codes = card_number_array(card_numbers)
+    valid = np.zeros(len(codes), dtype=bool)
+    networks = np.full(len(codes), -1, dtype=np.int16)
+    if codes.itemsize == 0:
+        return valid, networks
+    for start in range(0, len(codes), batch_size):
+        batch = codes[start:start + batch_size]
+        matrix = batch.view(np.uint8).reshape(len(batch), batch.itemsize)
+        lengths = np.count_nonzero(matrix, axis=1)
+        batch_networks, length_ok = index.lookup(matrix, lengths)
+        valid[start:start + batch_size] = luhn_valid_matrix(matrix, lengths) & length_ok
+        networks[start:start + batch_size] = batch_networks
+    return valid, networks
+
+def network_names(networks, index=DEFAULT_IIN_INDEX):
+    names = np.array(index.networks + ['unknown'])
+    return names[networks]
+
+def check_digits(partial_numbers):
+    # The digit that makes each partial number pass the Luhn check when appended
+    codes = card_number_array(partial_numbers)
+    if codes.itemsize == 0:
+        return np.zeros(len(codes), dtype=np.uint8)
+    matrix = codes.view(np.uint8).reshape(len(codes), codes.itemsize)
+    if not ALLOWED_BYTES[matrix].all():
+        raise ValueError('partial card numbers may only contain the digits 0-9')
+    totals = luhn_totals(matrix, np.count_nonzero(matrix, axis=1) + 1)
+    return ((10 - totals % 10) % 10).astype(np.uint8)
+
+def check_digit(partial_number):
+    return int(check_digits([partial_number])[0])
+
+def card_number_matrix(count, prefix='', length=16, rng=None):
+    # Rows of ASCII digits: the prefix, random digits, then the check digit
+    if prefix and not (prefix.isascii() and prefix.isdigit()):
+        raise ValueError(f'prefix may only contain the digits 0-9: {prefix!r}')
+    if len(prefix) >= length:
+        raise ValueError(f'prefix {prefix!r} leaves no room in a {length}-digit number')
+    rng = np.random.default_rng(rng)
+    matrix = np.empty((count, length), dtype=np.uint8)
+    matrix[:, :len(prefix)] = np.frombuffer(prefix.encode(), dtype=np.uint8)
+    matrix[:, len(prefix):-1] = rng.integers(ZERO, ZERO + 10, (count, length - len(prefix) - 1),
+                                             dtype=np.uint8)
+    totals = luhn_totals(matrix[:, :-1], length)
+    matrix[:, -1] = (10 - totals % 10) % 10 + ZERO
+    return matrix
+
+def generate_card_numbers(count, prefix='', length=16, rng=None):
+    return card_number_matrix(count, prefix, length, rng).view(f'S{length}').ravel()
+
+def read_blocks(source, block_size=BLOCK_SIZE):
+    # Blocks always end on a line boundary, so no record is split between tasks
+    while True:
+        block = source.read(block_size)
+        if not block:
+            return
+        if not block.endswith(b'\n'):
+            block += source.readline()
+        yield block
+
+def card_fields(lines, column=None):
+    # One record per line; a short CSV row yields an empty (invalid) number
+    if column is None:
+        return lines
+    return [row[column] if -len(row) <= column < len(row) else ''
+            for row in csv.reader(lines)]
+
+def validate_block(block, column=None, index=None):
+    # With an IIN index, records are also checked against network length rules,
+    # labelled with their network and counted per network
+    lines = [line for line in block.decode('utf-8', 'replace').splitlines() if line.strip()]
+    # Translating the whole block at once is far cheaper than one call per line
+    numbers = '\n'.join(card_fields(lines, column)).translate(CARD_TRANSLATION).split('\n')
+    network_counts = Counter()
+    if index is None:
+        valid = verify_card_numbers(numbers)
+    else:
+        valid, networks = classify_card_numbers(numbers, index)
+        names = network_names(networks, index).tolist()
+        lines = [f'{line},{name}' for line, name in zip(lines, names)]
+        network_counts.update(names)
+    valid_lines = list(compress(lines, valid))
+    invalid_lines = list(compress(lines, ~valid))
+    return (''.join(line + '\n' for line in valid_lines).encode(),
+            ''.join(line + '\n' for line in invalid_lines).encode(),
+            len(valid_lines), len(invalid_lines), network_counts)
+
+def bounded_map(executor, function, items, window):
+    # Like executor.map, but only keeps `window` tasks in flight so memory stays bounded
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(function, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def open_stream(path, mode):
+    # '-' means standard input/output, None discards the output
+    if path == '-':
+        stream = sys.stdin.buffer if 'r' in mode else sys.stdout.buffer
+        return contextlib.nullcontext(stream)
+    return open(os.devnull if path is None else path, mode)
+
+def validate_card_file(input_path, valid_path=None, invalid_path=None, column=None,
+                       skip_header=False, processes=1, block_size=BLOCK_SIZE, index=None):
+    # Writes valid and invalid records to separate outputs and returns both counts,
+    # plus the records per network when an IIN index is given
+    valid_count = invalid_count = 0
+    network_counts = Counter()
+    task = partial(validate_block, column=column, index=index)
+    with open_stream(input_path, 'rb') as source, \
+            open_stream(valid_path, 'wb') as valid_output, \
+            open_stream(invalid_path, 'wb') as invalid_output:
+        if skip_header:
+            header = source.readline()
+            valid_output.write(header)
+            invalid_output.write(header)
+
+        with contextlib.ExitStack() as stack:
+            blocks = read_blocks(source, block_size)
+            if processes > 1:
+                executor = stack.enter_context(ProcessPoolExecutor(processes))
+                results = bounded_map(executor, task, blocks, 2 * processes)
+            else:
+                results = map(task, blocks)
+
+            for valid_lines, invalid_lines, valid, invalid, networks in results:
+                valid_output.write(valid_lines)
+                invalid_output.write(invalid_lines)
+                valid_count += valid
+                invalid_count += invalid
+                network_counts += networks
+    return valid_count, invalid_count, network_counts
+
+def write_card_numbers(output_path, count, formats=(('4', 16),), seed=None,
+                       batch_size=BATCH_SIZE):
+    # Streams `count` valid numbers, one per line, spread at random over (prefix, length) formats
+    rng = np.random.default_rng(seed)
+    with open_stream(output_path, 'wb') as output:
+        for start in range(0, count, batch_size):
+            batch_counts = rng.multinomial(min(batch_size, count - start),
+                                           [1 / len(formats)] * len(formats))
+            for (prefix, length), batch_count in zip(formats, batch_counts):
+                lines = np.empty((batch_count, length + 1), dtype=np.uint8)
+                lines[:, :-1] = card_number_matrix(batch_count, prefix, length, rng)
+                lines[:, -1] = ord('\n')
+                output.write(lines.tobytes())
+
+def parse_format(text, default_length):
+    # 'PREFIX' or 'PREFIX:LENGTH'
+    prefix, _, length = text.partition(':')
+    try:
+        return prefix, int(length) if length else default_length
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'expected PREFIX or PREFIX:LENGTH, got {text!r}')
+
+def demo():
     card_number = '4111-1111-4555-1141'
-    card_translation = str.maketrans({'-': '', ' ': ''})
-    translated_card_number = card_number.translate(card_translation)
+    translated_card_number = card_number.translate(CARD_TRANSLATION)
 
     if verify_card_number(translated_card_number):
         print('VALID!')
     else:
         print('INVALID!')
 
-main()
\ No newline at end of file
+def main():
+    parser = argparse.ArgumentParser(description='Luhn validation for card files of any size')
+    commands = parser.add_subparsers(dest='mode', required=True)
+    command = commands.add_parser('validate', help='split a card file into valid and invalid records')
+    command.add_argument('input', help="newline-delimited or CSV file, or '-' for standard input")
+    command.add_argument('--valid', help="where to write valid records ('-' for standard output)")
+    command.add_argument('--invalid', help="where to write invalid records ('-' for standard output)")
+    command.add_argument('--column', type=int, help='CSV column holding the card number')
+    command.add_argument('--skip-header', action='store_true',
+                         help='copy the first line to both outputs without validating it')
+    command.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    command.add_argument('--block-size', type=int, default=BLOCK_SIZE,
+                         help='bytes per task (bounds memory use)')
+    command.add_argument('--networks', action='store_true',
+                         help='check network length rules and append the network to each record')
+    command.add_argument('--iin-table', help='CSV of IIN ranges: network,first,last,lengths')
+    command = commands.add_parser('generate', help='write valid synthetic card numbers')
+    command.add_argument('output', help="file to write, or '-' for standard output")
+    command.add_argument('--count', type=int, required=True)
+    command.add_argument('--prefix', action='append', metavar='PREFIX[:LENGTH]',
+                         help='number format, may be repeated (default: 4:16)')
+    command.add_argument('--length', type=int, default=16, help='length for prefixes without one')
+    command.add_argument('--seed', type=int, help='seed for reproducible output')
+    args = parser.parse_args()
+
+    try:
+        if args.mode == 'generate':
+            formats = [parse_format(prefix, args.length) for prefix in args.prefix or ['4']]
+            write_card_numbers(args.output, args.count, formats, args.seed)
+            return
+        index = None
+        if args.iin_table:
+            index = IINIndex.from_csv(args.iin_table)
+        elif args.networks:
+            index = DEFAULT_IIN_INDEX
+        valid, invalid, networks = validate_card_file(args.input, args.valid, args.invalid,
+                                                      args.column, args.skip_header,
+                                                      args.processes, args.block_size, index)
+    except (OSError, KeyError, ValueError, argparse.ArgumentTypeError) as error:
+        parser.error(str(error))
+    print(f'valid: {valid}, invalid: {invalid}', file=sys.stderr)
+    for network, count in networks.most_common():
+        print(f'{network}: {count}', file=sys.stderr)
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main()
+    else:
+        demo()
@@ -1,26 +1,414 @@
+import argparse
+import csv
+import json
+import os
+import time
+from array import array
+from collections import Counter
+from itertools import islice
+from operator import itemgetter
+import numpy as np
+
+# One fixed-size log record; dates are seconds since the Unix epoch
+RECORD = np.dtype([('amount', '<f8'), ('category', '<u4'), ('date', '<i8')])
+# The start of every log file, so a log of some other layout is refused instead of misread
+HEADER = np.dtype([('magic', 'S8'), ('version', '<u4'), ('record_size', '<u4')])
+LOG_MAGIC = b'EXPNSLOG'
+LOG_VERSION = 1
+LOG_BATCH_SIZE = 1024  # records buffered before the log is written and synced
+IMPORT_CHUNK_ROWS = 100_000  # rows parsed at a time when importing a file
+REPORT_CHUNK_ROWS = 1_000_000  # rows aggregated at a time when reporting
+
+def timestamp(date=None):
+    # Seconds since the epoch from a number, an ISO 8601 string or a date; None means now
+    if date is None:
+        return int(time.time())
+    if isinstance(date, (int, float)):
+        return int(date)
+    return int(np.datetime64(date, 's').astype(np.int64))
+
+class ExpenseLog:
+    # Append-only files: `path` holds fixed-size records and `path`.categories the category
+    # names, one JSON string per line, in code order. Names are synced before any record that
+    # uses them, and a torn tail left by a crash is cut off when the log is read. The records
+    # follow a HEADER naming the record layout; a log without a matching one is not loaded.
+
+    def __init__(self, path, batch_size=LOG_BATCH_SIZE):
+        self.path = path
+        self.categories_path = path + '.categories'
+        self.batch_size = batch_size
+        self.pending = []
+        self.pending_categories = []
+        self.records = self.categories = None
+
+    def read(self):
+        # Returns amounts, category codes, dates and category names; call before appending
+        names = []
+        if os.path.exists(self.categories_path):
+            with open(self.categories_path, 'rb+') as categories:
+                lines = categories.read().split(b'\n')
+                categories.truncate(categories.tell() - len(lines[-1]))
+            names = [json.loads(line) for line in lines[:-1]]
+
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if size:
+            self.check_header(size)
+        count = max(size - HEADER.itemsize, 0) // RECORD.itemsize
+        if count == 0:
+            records = np.zeros(0, dtype=RECORD)
+        else:
+            os.truncate(self.path, HEADER.itemsize + count * RECORD.itemsize)
+            records = np.memmap(self.path, dtype=RECORD, mode='r', offset=HEADER.itemsize,
+                                shape=(count,))
+        return records['amount'], records['category'], records['date'], names
+
+    def header(self):
+        return np.array((LOG_MAGIC, LOG_VERSION, RECORD.itemsize), dtype=HEADER).tobytes()
+
+    def check_header(self, size):
+        with open(self.path, 'rb') as log:
+            found = log.read(HEADER.itemsize)
+        expected = self.header()
+        if size < HEADER.itemsize and expected.startswith(found):
+            os.truncate(self.path, 0)  # A crash while the log was being created
+        elif found != expected:
+            raise ValueError(f'{self.path} is not an expense log with {RECORD.itemsize}-byte '
+                             f'records (version {LOG_VERSION}); it may be from an older version')
+
+    def append_category(self, name):
+        self.pending_categories.append(json.dumps(name) + '\n')
+
+    def append(self, amount, code, date):
+        self.pending.append((amount, code, date))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def append_records(self, records):
+        # Writes a whole array of RECORD entries at once, after anything still pending
+        self.flush()
+        self.write(self.records, records.tobytes())
+
+    def write(self, stream, data):
+        if data:
+            stream.write(data)
+            stream.flush()
+            os.fsync(stream.fileno())
+
+    def flush(self):
+        if self.records is None:
+            self.categories = open(self.categories_path, 'ab')
+            self.records = open(self.path, 'ab')
+            if self.records.tell() == 0:
+                self.write(self.records, self.header())
+        self.write(self.categories, ''.join(self.pending_categories).encode())
+        self.write(self.records, np.array(self.pending, dtype=RECORD).tobytes())
+        self.pending.clear()
+        self.pending_categories.clear()
+
+    def close(self):
+        self.flush()
+        self.records.close()
+        self.categories.close()
+
+
+class ExpenseStore:
+    # Columnar expenses: amounts and interned category codes in typed arrays, with a row
+    # index and a running total per category so totals are O(1) and filters O(matches)
+
+    def __init__(self, expenses=()):
+        self.log = None
+        self.amounts = array('d')
+        self.category_codes = array('I')
+        self.dates = array('q')
+        self.category_names = []
+        self.category_ids = {}
+        self.category_rows = []
+        self.category_totals = []
+        self.total = 0.0
+        for expense in expenses:
+            self.add(expense['amount'], expense['category'], expense.get('date'))
+
+    @classmethod
+    def open(cls, path, batch_size=LOG_BATCH_SIZE):
+        # Reloads the expenses logged at `path`; new expenses are appended to the same log
+        log = ExpenseLog(path, batch_size)
+        store = cls()
+        store.load(*log.read())
+        store.log = log
+        return store
+
+    def load(self, amounts, codes, dates, names):
+        # Bulk-fills an empty store from the columns read back from an ExpenseLog
+        for name in names:
+            self.category_id(name)
+        self.append_columns(amounts, codes, dates)
+
+    def extend(self, amounts, categories, dates=None):
+        # Adds a chunk of expenses with a few array operations instead of one add() each
+        amounts = np.ascontiguousarray(amounts, dtype=np.float64)
+        # Intern each distinct category once, then map the rest with plain dict lookups
+        chunk_codes = {category: self.category_id(category) for category in dict.fromkeys(categories)}
+        codes = np.fromiter(map(chunk_codes.__getitem__, categories), dtype=np.uint32,
+                            count=len(amounts))
+        if dates is None:
+            dates = np.full(len(amounts), timestamp(), dtype=np.int64)
+        self.append_columns(amounts, codes, dates)
+
+    def append_columns(self, amounts, codes, dates):
+        # Codes must already be interned; rows are indexed with one stable sort and the
+        # totals updated with one bincount
+        amounts = np.ascontiguousarray(amounts, dtype=np.float64)
+        codes = np.ascontiguousarray(codes, dtype=np.uint32)
+        dates = np.ascontiguousarray(dates, dtype=np.int64)
+        start = len(self.amounts)
+        self.amounts.frombytes(amounts.tobytes())
+        self.category_codes.frombytes(codes.tobytes())
+        self.dates.frombytes(dates.tobytes())
+
+        # A stable sort on 16-bit keys is a radix sort, several times faster than on 32-bit ones
+        sort_keys = codes.astype(np.uint16) if len(self.category_names) <= 2**16 else codes
+        rows = np.argsort(sort_keys, kind='stable').astype(np.int64) + start
+        counts = np.bincount(codes, minlength=len(self.category_names))
+        totals = np.bincount(codes, weights=amounts, minlength=len(self.category_names))
+        ends = np.cumsum(counts)
+        for code in np.flatnonzero(counts).tolist():
+            self.category_rows[code].frombytes(rows[ends[code] - counts[code]:ends[code]].tobytes())
+            self.category_totals[code] += float(totals[code])
+        self.total += float(amounts.sum())
+
+        if self.log is not None:
+            records = np.empty(len(amounts), dtype=RECORD)
+            records['amount'], records['category'], records['date'] = amounts, codes, dates
+            self.log.append_records(records)
+
+    def flush(self):
+        if self.log is not None:
+            self.log.flush()
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def __iter__(self):
+        for amount, code, date in zip(self.amounts, self.category_codes, self.dates):
+            yield {'amount': amount, 'category': self.category_names[code], 'date': date}
+
+    def category_id(self, category):
+        code = self.category_ids.get(category)
+        if code is None:
+            code = self.category_ids[category] = len(self.category_names)
+            self.category_names.append(category)
+            self.category_rows.append(array('q'))
+            self.category_totals.append(0.0)
+            if self.log is not None:
+                self.log.append_category(category)
+        return code
+
+    def add(self, amount, category, date=None):
+        code = self.category_id(category)
+        date = timestamp(date)
+        self.category_rows[code].append(len(self.amounts))
+        self.amounts.append(amount)
+        self.category_codes.append(code)
+        self.dates.append(date)
+        self.category_totals[code] += amount
+        self.total += amount
+        if self.log is not None:
+            self.log.append(amount, code, date)
+
+    def category_total(self, category):
+        code = self.category_ids.get(category)
+        return 0.0 if code is None else self.category_totals[code]
+
+    def filter(self, category):
+        code = self.category_ids.get(category)
+        if code is None:
+            return
+        for row in self.category_rows[code]:
+            yield {'amount': self.amounts[row], 'category': category, 'date': self.dates[row]}
+
+
+class ExpenseReport:
+    # Group-by-category counts and sums, and totals per calendar window ('D', 'W', 'M' or 'Y'),
+    # accumulated chunk by chunk so memory does not grow with the number of rows. Weeks start
+    # on Monday and are labelled with that day.
+
+    def __init__(self, window='M'):
+        self.window = window
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.sums = np.zeros(0)
+        self.window_totals = Counter()
+
+    def update(self, amounts, codes, dates):
+        size = max(len(self.counts), int(codes.max()) + 1 if len(codes) else 0)
+        grow = (0, size - len(self.counts))
+        self.counts = np.pad(self.counts, grow) + np.bincount(codes, minlength=size)
+        self.sums = np.pad(self.sums, grow) + np.bincount(codes, weights=amounts, minlength=size)
+
+        if self.window == 'W':
+            # datetime64[W] weeks start on Thursday, like 1970-01-01; count from a Monday instead
+            days = dates.astype('datetime64[s]').astype('datetime64[D]').astype(np.int64)
+            windows = (days + 3) // 7
+        else:
+            windows = dates.astype('datetime64[s]').astype(f'datetime64[{self.window}]').astype(np.int64)
+        keys, inverse = np.unique(windows, return_inverse=True)
+        totals = np.bincount(inverse.ravel(), weights=amounts, minlength=len(keys))
+        self.window_totals.update(dict(zip(keys.tolist(), totals.tolist())))
+
+    def categories(self, names):
+        # (category, count, total, mean) for every category with expenses
+        return [(names[code], int(self.counts[code]), float(self.sums[code]),
+                 float(self.sums[code] / self.counts[code]))
+                for code in np.flatnonzero(self.counts).tolist()]
+
+    def windows(self):
+        if self.window == 'W':
+            label = lambda key: str(np.datetime64(key * 7 - 3, 'D'))
+        else:
+            label = lambda key: str(np.datetime64(key, self.window))
+        return [(label(key), total) for key, total in sorted(self.window_totals.items())]
+
+
+def parse_amounts(path, values, first_row):
+    # Amounts as floats; a missing, non-numeric or infinite one is reported with its row number
+    try:
+        amounts = np.array(values).astype(np.float64)
+    except (TypeError, ValueError):
+        amounts = None
+    if amounts is not None and amounts.ndim == 1 and np.isfinite(amounts).all():
+        return amounts
+    for row, value in enumerate(values, first_row):
+        try:
+            if not np.isfinite(float(value)):
+                raise ValueError
+        except (TypeError, ValueError):
+            raise ValueError(f'{path}: row {row} has no valid amount: {value!r}') from None
+
+def check_categories(path, categories, first_row):
+    for row, category in enumerate(categories, first_row):
+        if category is None or category == '':
+            raise ValueError(f'{path}: row {row} has no category')
+
+def read_expense_chunks(path, chunk_rows=IMPORT_CHUNK_ROWS):
+    # Yields (amounts, categories, dates) column chunks from a CSV file with a header row or a
+    # JSON-lines file, with 'amount' and 'category' fields and an optional ISO 8601 'date'.
+    # A chunk with a row missing its amount or category raises ValueError naming the row.
+    with open(path, newline='') as source:
+        if path.endswith(('.jsonl', '.ndjson')):
+            rows = (json.loads(line) for line in source if line.strip())
+            def column(chunk, name):
+                return [row.get(name) for row in chunk]
+        else:
+            rows = csv.reader(source)
+            positions = {name.strip(): position for position, name in enumerate(next(rows, []))}
+            if 'amount' not in positions or 'category' not in positions:
+                raise ValueError(f'{path}: the header needs amount and category columns')
+            def column(chunk, name):
+                if name not in positions:
+                    return [None] * len(chunk)
+                try:
+                    return list(map(itemgetter(positions[name]), chunk))
+                except IndexError:
+                    raise ValueError(f'{path}: a row has no {name} column') from None
+
+        first_row = 1
+        while True:
+            chunk = list(islice(rows, chunk_rows))
+            if not chunk:
+                return
+            amounts = parse_amounts(path, column(chunk, 'amount'), first_row)
+            categories = column(chunk, 'category')
+            check_categories(path, categories, first_row)
+            first_row += len(chunk)
+            dates = np.array([date or 'NaT' for date in column(chunk, 'date')],
+                             dtype='datetime64[s]').astype(np.int64)
+            dates[dates == np.datetime64('NaT').astype(np.int64)] = timestamp()
+            yield amounts, categories, dates
+
+
 def add_expense(expenses, amount, category):
-    expenses.append({'amount': amount, 'category': category})
+    expenses.add(amount, category)
     
 def print_expenses(expenses):
     for expense in expenses:
         print(f'Amount: {expense["amount"]}, Category: {expense["category"]}')
     
 def total_expenses(expenses):
-    return sum(map(lambda expense: expense['amount'], expenses))
+    return expenses.total
     
 def filter_expenses_by_category(expenses, category):
-    return filter(lambda expense: expense['category'] == category, expenses)
+    return expenses.filter(category)
+
+def import_expenses(expenses, path, chunk_rows=IMPORT_CHUNK_ROWS):
+    # Streams a CSV or JSON-lines file into the store; returns the number of rows added.
+    # Chunks before an invalid one stay imported, and the error says how many rows that was.
+    count = 0
+    try:
+        for amounts, categories, dates in read_expense_chunks(path, chunk_rows):
+            expenses.extend(amounts, categories, dates)
+            count += len(amounts)
+    except ValueError as error:
+        raise ValueError(f'{error}; {count} earlier rows were imported') from error
+    return count
+
+def expense_report(expenses, window='M', chunk_rows=REPORT_CHUNK_ROWS):
+    report = ExpenseReport(window)
+    for start in range(0, len(expenses), chunk_rows):
+        stop = min(start + chunk_rows, len(expenses))
+        report.update(np.array(expenses.amounts[start:stop]),
+                      np.array(expenses.category_codes[start:stop], dtype=np.uint32),
+                      np.array(expenses.dates[start:stop], dtype=np.int64))
+    return report
+
+def print_report(expenses, window='M'):
+    report = expense_report(expenses, window)
+    print(f'{"Category":<20} {"Count":>10} {"Total":>14} {"Mean":>10}')
+    for category, count, total, mean in report.categories(expenses.category_names):
+        print(f'{category:<20} {count:>10} {total:>14.2f} {mean:>10.2f}')
+    print()
+    for label, total in report.windows():
+        print(f'{label:<20} {total:>14.2f}')
     
 
 def main():
-    expenses = []
+    parser = argparse.ArgumentParser(description='Expense tracker')
+    parser.add_argument('--log', default='expenses.log', help='file the expenses are kept in')
+    parser.add_argument('--import', dest='imports', action='append', metavar='FILE',
+                        help='add the expenses in a CSV or JSON-lines file, then exit')
+    parser.add_argument('--report', action='store_true', help='print a report, then exit')
+    parser.add_argument('--window', choices='DWMY', default='M',
+                        help='time window of the report totals (default: month)')
+    args = parser.parse_args()
+
+    try:
+        expenses = ExpenseStore.open(args.log)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+    try:
+        for path in args.imports or []:
+            print(f'Imported {import_expenses(expenses, path)} expenses from {path}')
+        if args.report:
+            print_report(expenses, args.window)
+        if not (args.imports or args.report):
+            run(expenses)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+    finally:
+        expenses.close()
+
+def run(expenses):
     while True:
         print('\nExpense Tracker')
         print('1. Add an expense')
         print('2. List all expenses')
         print('3. Show total expenses')
         print('4. Filter expenses by category')
-        print('5. Exit')
+        print('5. Import expenses from a file')
+        print('6. Show report')
+        print('7. Exit')
        
         choice = input('Enter your choice: ')
 
@@ -28,6 +416,8 @@ def main():
             amount = float(input('Enter amount: '))
             category = input('Enter category: ')
             add_expense(expenses, amount, category)
+            # Written straight away, so a typed-in expense survives the terminal being closed
+            expenses.flush()
 
         elif choice == '2':
             print('\nAll Expenses:')
@@ -43,5 +433,20 @@ def main():
             print_expenses(expenses_from_category)
     
         elif choice == '5':
+            path = input('Enter CSV or JSON-lines file: ')
+            try:
+                print(f'\nImported {import_expenses(expenses, path)} expenses')
+            except (OSError, ValueError) as error:
+                print(f'\nCould not import {path}: {error}')
+
+        elif choice == '6':
+            print()
+            window = input('Enter window (D, W, M or Y): ').upper()
+            print_report(expenses, window if window in ('D', 'W', 'M', 'Y') else 'M')
+
+        elif choice == '7':
             print('Exiting the program.')
-            break
\ No newline at end of file
+            break
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,491 @@
+import argparse
+import ast
+import builtins
+import fileinput
+import io
+import keyword
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+import tokenize
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from itertools import islice
+
+CACHE_SIZE = 1 << 16  # distinct identifiers remembered per target case
+CACHE_SAMPLE = 4096  # identifiers convert_many sees before deciding whether to use the cache
+
+def character_ranges(predicate, stop=0x20000):
+    # The code points below stop that satisfy predicate, as ranges for a regex character class
+    ranges, first = [], None
+    for code in range(stop + 1):
+        if code < stop and predicate(chr(code)):
+            if first is None:
+                first = code
+        elif first is not None:
+            ranges.append(f'\\U{first:08x}-\\U{code - 1:08x}')
+            first = None
+    return ''.join(ranges)
+
+def case_patterns(upper, lower=None, lower_letter=None):
+    # Patterns for identifiers whose capitals are the characters of the class `upper`; by
+    # default any other letter or digit, including uncased scripts, counts as lowercase
+    lower = lower or rf'[^\W_{upper}]'
+    lower_letter = lower_letter or rf'[^\W\d_{upper}]'
+    return {
+        # Words of an identifier, most common form first: lowercase, capitalised, then an
+        # acronym with its digits unless its last capital starts the next word
+        # (HTTPServer -> HTTP, Server)
+        'words': re.compile(rf'{lower}+|[{upper}]{lower}+|[{upper}]+\d*(?!{lower})').findall,
+        # Identifiers a case leaves exactly as they are, which skip splitting and joining
+        'snake': re.compile(rf'{lower_letter}{lower}*(?:_{lower}+)*').fullmatch,
+        'camel': re.compile(rf'{lower_letter}{lower}*(?:[{upper}]{lower}+)*[{upper}]?').fullmatch,
+        # Names a rewrite to each case renames: mixedCase for snake, inner underscores for camel
+        'rewrite_snake': re.compile(rf'_*{lower_letter}{lower}*[{upper}]').match,
+        'rewrite_camel': re.compile(rf'_*{lower_letter}{lower}*_{lower}').match,
+    }
+
+ASCII_PATTERNS = case_patterns('A-Z', '[a-z0-9]', '[a-z]')
+
+@lru_cache(maxsize=None)
+def unicode_patterns():
+    # Capitals from str.istitle, since re has no \p{Lu}; no cased letters lie past the first two
+    # planes. Compiled on first use, as classes this large take a while to compile.
+    return case_patterns(character_ranges(str.istitle))
+
+def patterns(identifier):
+    return ASCII_PATTERNS if identifier.isascii() else unicode_patterns()
+
+CASES = {
+    'snake': lambda words: '_'.join(words).lower(),
+    'kebab': lambda words: '-'.join(words).lower(),
+    'constant': lambda words: '_'.join(words).upper(),
+    'camel': lambda words: words[0].lower() + ''.join(map(str.capitalize, words[1:])),
+    'pascal': lambda words: ''.join(map(str.capitalize, words)),
+}
+
+def convert_case_uncached(identifier, case):
+    # Leading and trailing underscores are kept, so _private names survive; __dunder__ names
+    # are returned unchanged in every case. Identifiers that may already be in the target case
+    # (snake without capitals, camel without underscores) are checked first, as that is cheaper
+    # than splitting and joining them.
+    found = ASCII_PATTERNS if identifier.isascii() else unicode_patterns()
+    if ((identifier.islower() if case == 'snake' else case == 'camel' and '_' not in identifier)
+            and found[case](identifier)):
+        return identifier
+    words = found['words'](identifier)
+    if not words:
+        return identifier
+    converted = CASES[case](words)
+    if identifier[0] == '_' or identifier[-1] == '_':
+        if len(identifier) > 4 and identifier[:2] == '__' == identifier[-2:]:
+            return identifier
+        body = identifier.strip('_')
+        start = identifier.index(body)
+        converted = identifier[:start] + converted + identifier[start + len(body):]
+    return converted
+
+def cached_converter(case):
+    # One single-argument cache per case keeps cache hits on the C fast path
+    @lru_cache(maxsize=CACHE_SIZE)
+    def convert(identifier):
+        return convert_case_uncached(identifier, case)
+    return convert
+
+CONVERTERS = {case: cached_converter(case) for case in CASES}
+
+# Anything that may be a NAME token; used to collect the names of a file cheaply
+NAME = re.compile(r'[^\W\d]\w*')
+# Cases a rewrite can target; classes, CONSTANTS, dunders, keywords and builtins are always
+# left alone
+REWRITE_CASES = ('snake', 'camel')
+F_STRING_PREFIX = re.compile(r'[rRbBuU]?[fF]')
+RESERVED_NAMES = set(keyword.kwlist) | set(keyword.softkwlist) | set(dir(builtins))
+SOURCE_SUFFIXES = ('.py',)
+# Module-level hooks that code outside the tree looks up by name
+HOOK_NAMES = {'load_tests', 'setUpModule', 'tearDownModule'}
+
+def converter(case):
+    try:
+        return CONVERTERS[case]
+    except KeyError:
+        raise ValueError(f'unknown case {case!r}, expected one of {", ".join(CASES)}') from None
+
+def convert_case(identifier, case='snake'):
+    return converter(case)(identifier)
+
+def convert_many(identifiers, case='snake'):
+    # Lazily converts any iterable; repeated identifiers come from the LRU cache. A stream in
+    # which fewer than one in five of the first CACHE_SAMPLE identifiers is a cache hit skips
+    # the cache for the rest, as its bookkeeping then costs more than the hits save.
+    return convert_stream(iter(identifiers), converter(case), case)
+
+def convert_stream(identifiers, cached, case):
+    hits = cached.cache_info().hits
+    yield from map(cached, islice(identifiers, CACHE_SAMPLE))
+    if (cached.cache_info().hits - hits) * 5 >= CACHE_SAMPLE:
+        yield from map(cached, identifiers)
+    else:
+        yield from map(partial(convert_case_uncached, case=case), identifiers)
+
 def convert_to_snake_case(pascal_or_camel_cased_string):
+    return CONVERTERS['snake'](pascal_or_camel_cased_string)
 
-    snake_cased_char_list = [
-        '_' + char.lower() if char.isupper()
-        else char
-        for char in pascal_or_camel_cased_string
-    ]
+def source_files(root, suffixes=SOURCE_SUFFIXES):
+    # Walks a tree in a stable order, skipping hidden directories such as .git
+    if os.path.isfile(root):
+        yield root
+        return
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories[:] = sorted(name for name in subdirectories if not name.startswith('.'))
+        for name in sorted(files):
+            if name.endswith(suffixes):
+                yield os.path.join(directory, name)
 
-    return ''.join(snake_cased_char_list).strip('_')
+def read_source(path):
+    # Decodes with the encoding tokenize would use; newlines are kept exactly as they are
+    with open(path, 'rb') as source:
+        data = source.read()
+    encoding, _ = tokenize.detect_encoding(io.BytesIO(data).readline)
+    return data.decode(encoding), encoding
 
-def main():
+def base_name(node):
+    # The name a base class is written as, or None for anything computed
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return None
+
+def assigned_names(statement):
+    # Plain names bound by a statement directly in a module or class body
+    if isinstance(statement, ast.Assign):
+        targets = statement.targets
+    elif isinstance(statement, ast.AnnAssign):
+        targets = [statement.target]
+    else:
+        return set()
+    return {target.id for target in targets if isinstance(target, ast.Name)}
+
+def tree_bindings(tree):
+    # What a module binds, as sets: every bound name, names that may follow a dot, names that
+    # may be passed as keyword arguments, function and class names, (callee, keyword) for each
+    # keyword argument in a call, and strings spelling an identifier, as getattr, setattr and
+    # __all__ use; plus (class, bases, methods) for each class
+    found = {key: set() for key in ('names', 'attributes', 'keywords', 'definitions', 'calls',
+                                    'strings')}
+    found['classes'] = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+            arguments = node.args
+            parameters = {argument.arg for argument in
+                          arguments.posonlyargs + arguments.args + arguments.kwonlyargs}
+            found['keywords'] |= parameters
+            found['names'] |= parameters
+            found['names'].update(argument.arg for argument in (arguments.vararg, arguments.kwarg)
+                                  if argument)
+            if not isinstance(node, ast.Lambda):
+                found['names'].add(node.name)
+                found['definitions'].add(node.name)
+        elif isinstance(node, ast.ClassDef):
+            found['names'].add(node.name)
+            found['definitions'].add(node.name)
+            methods = {statement.name for statement in node.body
+                       if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef))}
+            fields = set().union(*map(assigned_names, node.body))
+            found['attributes'] |= methods | fields
+            found['keywords'] |= fields  # dataclass and namedtuple style fields
+            found['classes'].append((node.name, [base_name(base) for base in node.bases], methods))
+        elif isinstance(node, ast.Call):
+            callee = base_name(node.func)
+            found['calls'].update((callee, keyword.arg) for keyword in node.keywords if keyword.arg)
+        elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            found['names'].add(node.id)
+        elif (isinstance(node, ast.Constant) and isinstance(node.value, str)
+              and node.value.isidentifier()):
+            found['strings'].add(node.value)
+        elif (isinstance(node, ast.Attribute) and isinstance(node.ctx, ast.Store)
+              and isinstance(node.value, ast.Name) and node.value.id in ('self', 'cls')):
+            found['names'].add(node.attr)
+            found['attributes'].add(node.attr)
+        elif isinstance(node, ast.alias) and node.asname:
+            found['names'].add(node.asname)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            found['names'].add(node.name)
+    # Module-level definitions can be reached as module.name from other files
+    for statement in tree.body:
+        if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            found['attributes'].add(statement.name)
+        else:
+            found['attributes'] |= assigned_names(statement)
+    return found
+
+def f_string_names(source):
+    # Names in f-strings that tokenize returns as one STRING token, as it does before Python
+    # 3.12. Those cannot be renamed in place, so renaming them anywhere would break the code.
+    return {name for token in tokenize.generate_tokens(io.StringIO(source).readline)
+            if token.type == tokenize.STRING and F_STRING_PREFIX.match(token.string)
+            for name in NAME.findall(token.string)}
+
+def scan_file(path):
+    # What tree_bindings finds in a file, plus 'used': every name that appears in it at all,
+    # and 'f_strings': the names f_string_names finds
+    try:
+        source = read_source(path)[0]
+        found = tree_bindings(ast.parse(source))
+        found['used'] = set(NAME.findall(source))
+        found['f_strings'] = f_string_names(source)
+        return found
+    except (OSError, SyntaxError, UnicodeDecodeError, ValueError, tokenize.TokenError):
+        return None
+
+def outside_methods(classes):
+    # Methods of classes that derive, directly or through the tree's own classes, from a class
+    # defined elsewhere. They may override it (setUp, visit_Name), so renaming them is unsafe.
+    bases = {}
+    for name, class_bases, _ in classes:
+        bases.setdefault(name, set()).update(class_bases)
+    outside = {name for name, class_bases in bases.items()
+               if any(base is None or base not in bases and base != 'object'
+                      for base in class_bases)}
+    changed = True
+    while changed:
+        derived = {name for name, class_bases in bases.items() if class_bases & outside} - outside
+        outside |= derived
+        changed = bool(derived)
+    return {method for name, _, methods in classes if name in outside for method in methods}
+
+def build_memo(names, case='snake', exclude=(), taken=None):
+    # The one table of conversions every worker applies. Names whose new form already exists
+    # among the taken names (by default `names` itself), or that would merge with another
+    # renamed name, are left out and returned as collisions.
+    candidate = 'rewrite_' + case
+    convert = converter(case)
+    taken = names if taken is None else taken
+    conversions = {name: convert(name) for name in names
+                   if patterns(name)[candidate](name) and name not in RESERVED_NAMES
+                   and name not in exclude and not (name.startswith('__') and name.endswith('__'))}
+    targets = Counter(conversions.values())
+    collisions = {name for name, new_name in conversions.items()
+                  if new_name in taken or targets[new_name] > 1}
+    memo = {name: new_name for name, new_name in conversions.items()
+            if name not in collisions and new_name != name}
+    return memo, sorted(collisions)
+
+def tree_packages(root, paths):
+    # Top-level module names the tree provides, so imports of anything else are known to be
+    # from outside it
+    root = os.path.abspath(root)
+    base = root if os.path.isdir(root) else os.path.dirname(root)
+    packages = {os.path.basename(base)}
+    for path in paths:
+        top = os.path.relpath(os.path.abspath(path), base).split(os.sep)[0]
+        packages.add(top.removesuffix('.py'))
+    return packages
+
+def name_contexts(source, packages):
+    # Positions, as (row, byte column), of: the ends of attribute names, the starts of keyword
+    # argument names, the ends of attributes of names imported from outside the tree, and the
+    # names spelled out in imports from outside it. Also the names those imports bind unchanged.
+    tree = ast.parse(source)
+    attribute_ends, keyword_starts, outside_ends, import_starts = set(), set(), set(), set()
+    outside, imported = set(), set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            aliases = [alias for alias in node.names if alias.name.split('.')[0] not in packages]
+            outside.update(alias.asname or alias.name.split('.')[0] for alias in aliases)
+        elif (isinstance(node, ast.ImportFrom) and not node.level
+              and node.module.split('.')[0] not in packages):
+            aliases = node.names
+            outside.update(alias.asname or alias.name for alias in aliases)
+            imported.update(alias.name for alias in aliases if not alias.asname)
+        else:
+            continue
+        for alias in aliases:
+            # Each part of a dotted module name, spelled in the source without spaces
+            column = alias.col_offset
+            for part in alias.name.split('.'):
+                import_starts.add((alias.lineno, column))
+                column += len(part.encode()) + 1
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute):
+            end = (node.end_lineno, node.end_col_offset)
+            attribute_ends.add(end)
+            if isinstance(node.value, ast.Name) and node.value.id in outside:
+                outside_ends.add(end)
+        elif isinstance(node, ast.keyword) and node.arg is not None:
+            keyword_starts.add((node.lineno, node.col_offset))
+    return attribute_ends, keyword_starts, outside_ends, import_starts, imported
+
+def rewrite_source(source, memo, contexts=None):
+    # Only NAME tokens change; strings and comments are untouched. Given contexts, the sets of
+    # (attribute names, keyword names, top-level packages) the tree defines, a name after a
+    # dot is renamed only if it is in the first set and a keyword argument only if it is in the
+    # second; names imported from other packages, and their attributes, are left alone.
+    lines = io.StringIO(source).readlines()
+    if contexts is not None:
+        attributes, keywords, packages = contexts
+        attribute_ends, keyword_starts, outside_ends, import_starts, imported = \
+            name_contexts(source, packages)
+    edits = []
+    for token in tokenize.generate_tokens(io.StringIO(source).readline):
+        if token.type == tokenize.NAME and token.string in memo:
+            if contexts is not None:
+                (row, start), (_, end) = token.start, token.end
+                line = lines[row - 1]
+                start = len(line[:start].encode())  # ast counts columns in UTF-8 bytes
+                end = start + len(token.string.encode())
+                if (token.string in imported or (row, start) in import_starts
+                        or (row, end) in outside_ends
+                        or (row, end) in attribute_ends and token.string not in attributes
+                        or (row, start) in keyword_starts and token.string not in keywords):
+                    continue
+            edits.append(token)
+    for token in reversed(edits):
+        (row, start), (_, end) = token.start, token.end
+        line = lines[row - 1]
+        lines[row - 1] = line[:start] + memo[token.string] + line[end:]
+    return ''.join(lines), len(edits)
+
+def write_atomic(path, data):
+    # A sibling temporary file renamed over the original, so readers never see a partial file
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                             prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as output:
+            output.write(data)
+            output.flush()
+            os.fsync(output.fileno())
+        shutil.copymode(path, temporary)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+def rewrite_file(path, memo, dry_run=False, contexts=None):
+    # Returns (identifiers rewritten, error message or None)
+    try:
+        source, encoding = read_source(path)
+        rewritten, count = rewrite_source(source, memo, contexts)
+        if count and not dry_run:
+            write_atomic(path, rewritten.encode(encoding))
+        return count, None
+    except (OSError, SyntaxError, UnicodeError, tokenize.TokenError) as error:
+        return 0, f'{path}: {error}'
+
+worker_memo = {}
+worker_contexts = []
+
+def init_worker(memo, contexts=None):
+    # Each worker receives the memo table once, instead of with every file
+    worker_memo.update(memo)
+    worker_contexts[:] = [contexts]
+
+def rewrite_file_in_worker(path, dry_run=False):
+    return rewrite_file(path, worker_memo, dry_run, worker_contexts[0])
+
+def run_tasks(function, items, processes, initializer=None, initargs=()):
+    if processes == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        return list(map(function, items))
+    with ProcessPoolExecutor(processes, initializer=initializer, initargs=initargs) as executor:
+        return list(executor.map(function, items, chunksize=16))
+
+def rewrite_tree(root, case='snake', exclude=(), processes=None, dry_run=False,
+                 all_names=False):
+    # Renames identifiers across every source file under root in two parallel passes: collect
+    # the names the tree uses and binds, build the memo table once, then rewrite each file with
+    # it. Only names the tree binds itself are renamed. Names code may look up by name, such as
+    # methods that may override a class from outside the tree, keywords passed to functions
+    # from outside it and names also spelled as strings, are left alone and returned as
+    # 'pinned'; all_names renames every matching name instead. Either way names used in an
+    # f-string that tokenize cannot see into are never renamed, and are returned as 'f_strings'.
+    started = time.perf_counter()
+    paths = list(source_files(root))
+    scans = [scan for scan in run_tasks(scan_file, paths, processes) if scan is not None]
+    merged = {key: set().union(*(scan[key] for scan in scans))
+              for key in ('used', 'names', 'attributes', 'keywords', 'definitions', 'calls',
+                          'strings', 'f_strings')}
+    outside_keywords = {keyword for callee, keyword in merged['calls']
+                        if callee not in merged['definitions']}
+    unsafe = (outside_methods([entry for scan in scans for entry in scan['classes']])
+              | outside_keywords | merged['strings'] | HOOK_NAMES)
+    in_f_strings = merged['f_strings']
+    if all_names:
+        candidates, unsafe, contexts = merged['used'], set(), None
+    else:
+        candidates = merged['names']
+        contexts = (merged['attributes'], merged['keywords'], tree_packages(root, paths))
+    memo, collisions = build_memo(candidates - unsafe - in_f_strings, case, exclude,
+                                  taken=merged['used'])
+    pinned = sorted(build_memo(candidates & unsafe - in_f_strings, case, exclude,
+                               taken=merged['used'])[0])
+    f_strings = sorted(build_memo(candidates & in_f_strings, case, exclude,
+                                  taken=merged['used'])[0])
+    results = run_tasks(partial(rewrite_file_in_worker, dry_run=dry_run), paths, processes,
+                        init_worker, (memo, contexts))
+    return {
+        'files': len(paths),
+        'files_changed': sum(1 for count, _ in results if count),
+        'identifiers': sum(count for count, _ in results),
+        'renamed': len(memo),
+        'collisions': collisions,
+        'pinned': pinned,
+        'f_strings': f_strings,
+        'errors': [error for _, error in results if error],
+        'seconds': time.perf_counter() - started,
+    }
+
+def demo():
     print(convert_to_snake_case('aLongAndComplexString'))
 
-main()
\ No newline at end of file
+def main():
+    parser = argparse.ArgumentParser(description='Convert identifiers between cases')
+    commands = parser.add_subparsers(dest='mode', required=True)
+    command = commands.add_parser('convert', help='convert identifiers given one per line')
+    command.add_argument('files', nargs='*', help="files to read, or '-' for standard input")
+    command.add_argument('--case', choices=CASES, default='snake')
+    command = commands.add_parser('rewrite', help='rename identifiers across a source tree')
+    command.add_argument('root', help='directory or file to rewrite in place')
+    command.add_argument('--case', choices=REWRITE_CASES, default='snake')
+    command.add_argument('--exclude', action='append', default=[], metavar='NAME',
+                         help='identifier to leave alone, such as a third-party API name')
+    command.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    command.add_argument('--dry-run', action='store_true', help='report without writing files')
+    command.add_argument('--all-names', action='store_true',
+                         help='also rename names the tree does not define, such as library APIs '
+                              'and overridden methods; this can break working code')
+    args = parser.parse_args()
+
+    if args.mode == 'convert':
+        with fileinput.input(args.files) as lines:
+            identifiers = (line.rstrip('\r\n') for line in lines)
+            sys.stdout.writelines(name + '\n' for name in convert_many(identifiers, args.case))
+        return
+
+    stats = rewrite_tree(args.root, args.case, set(args.exclude), args.processes, args.dry_run,
+                         args.all_names)
+    for error in stats['errors']:
+        print(f'skipped {error}', file=sys.stderr)
+    for name in stats['collisions']:
+        print(f'not renamed, the new name is already taken: {name}', file=sys.stderr)
+    for name in stats['pinned']:
+        print(f'not renamed, code outside the tree may refer to it by name: {name}',
+              file=sys.stderr)
+    for name in stats['f_strings']:
+        print(f'not renamed, an f-string uses it: {name}', file=sys.stderr)
+    seconds = max(stats['seconds'], 1e-9)
+    print(f"{stats['identifiers']} identifiers ({stats['renamed']} distinct names) in "
+          f"{stats['files_changed']} of {stats['files']} files, {stats['seconds']:.2f}s: "
+          f"{stats['files'] / seconds:.0f} files/s, {stats['identifiers'] / seconds:.0f} identifiers/s")
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main()
+    else:
+        demo()
@@ -1,3 +1,9 @@
+import argparse
+import math
+import sys
+import time
+import numpy as np
+
 def square_root_bisection(square_target, tolerance=1e-7, max_iterations=100):
     if square_target < 0:
         raise ValueError('Square root of negative number is not defined in real numbers')
@@ -34,5 +40,324 @@ def square_root_bisection(square_target, tolerance=1e-7, max_iterations=100):
     
     return root
 
+COMPACT_FRACTION = 0.25  # share of the working set that must finish before it is shrunk
+
+def bisect_square_roots(targets, tolerance, max_iterations):
+    # The scalar algorithm on a 1-d array. A finished element has its root recorded once and
+    # is then ignored; the working set is shrunk only when enough have finished to pay for
+    # the copy.
+    roots = np.full(len(targets), np.nan)
+    index = np.arange(len(targets))
+    finished = np.zeros(len(targets), dtype=bool)
+    low = np.zeros(len(targets))
+    high = np.maximum(1, targets)
+
+    for _ in range(max_iterations):
+        if not len(index):
+            break
+        mid = (low + high) / 2
+        square_mid = mid**2
+
+        done = (np.abs(square_mid - targets) < tolerance) & ~finished
+        if done.any():
+            roots[index[done]] = mid[done]
+            finished |= done
+            if np.count_nonzero(finished) >= COMPACT_FRACTION * len(index):
+                keep = ~finished
+                index, targets, low, high = index[keep], targets[keep], low[keep], high[keep]
+                mid, square_mid, finished = mid[keep], square_mid[keep], finished[keep]
+
+        below = square_mid < targets
+        low = np.where(below, mid, low)
+        high = np.where(below, high, mid)
+    return roots
+
+def newton_square_roots(targets, tolerance, max_iterations):
+    # Starts at a power of two just above each root, taken from the float exponent, so every
+    # step moves down towards the root and large targets need no extra steps
+    roots = np.full(len(targets), np.nan)
+    index = np.arange(len(targets))
+    finished = np.zeros(len(targets), dtype=bool)
+    _, exponent = np.frexp(targets)
+    x = np.ldexp(1.0, (exponent + 1) // 2)
+
+    for _ in range(max_iterations):
+        if not len(index):
+            break
+        done = (np.abs(x**2 - targets) < tolerance) & ~finished
+        if done.any():
+            roots[index[done]] = x[done]
+            finished |= done
+            if np.count_nonzero(finished) >= COMPACT_FRACTION * len(index):
+                keep = ~finished
+                index, targets, x, finished = index[keep], targets[keep], x[keep], finished[keep]
+        x = (x + targets / x) / 2
+    return roots
+
+SQUARE_ROOT_METHODS = {'bisection': bisect_square_roots, 'newton': newton_square_roots}
+
+def square_root_array(square_targets, tolerance=1e-7, max_iterations=100, method='bisection'):
+    # Square roots of a whole array at once, with the same stopping rule as
+    # square_root_bisection. Returns the roots and a convergence mask; roots that did not
+    # converge within max_iterations are NaN, where the scalar version returns None.
+    targets = np.asarray(square_targets, dtype=np.float64)
+    if np.any(targets < 0):
+        raise ValueError('Square root of negative number is not defined in real numbers')
+    try:
+        solve = SQUARE_ROOT_METHODS[method]
+    except KeyError:
+        raise ValueError(f'unknown method {method!r}, expected one of '
+                         f'{", ".join(SQUARE_ROOT_METHODS)}') from None
+
+    flat = targets.ravel()
+    roots = np.full(flat.shape, np.nan)
+    exact = (flat == 0) | (flat == 1)
+    roots[exact] = flat[exact]
+    # Squares of huge targets overflow to inf; those elements simply never converge
+    with np.errstate(over='ignore', invalid='ignore'):
+        roots[~exact] = solve(flat[~exact], tolerance, max_iterations)
+    roots = roots.reshape(targets.shape)
+    return roots, ~np.isnan(roots)
+
+ROOT_FINDERS = {}
+BRACKETING_METHODS = {'bisection', 'brent'}  # need f(low) and f(high) of opposite signs
+MAX_EXPANSIONS = 12  # each one squares the growth factor, enough to span the float range
+
+def root_finder(name, bracketing=False):
+    # Registers a method under `name`. It is called as
+    # method(f, low, high, f_low, f_high, tolerance, max_iterations, derivative)
+    # and returns (root, f(root), iterations).
+    def register(method):
+        ROOT_FINDERS[name] = method
+        if bracketing:
+            BRACKETING_METHODS.add(name)
+        return method
+    return register
+
+def midpoint(low, high):
+    # Geometric when the bracket spans orders of magnitude on one side of zero, so a bracket
+    # such as [1e-300, 1e300] shrinks by exponents instead of by halves
+    if low > 0 and high > 4 * low:
+        return math.sqrt(low) * math.sqrt(high)
+    if high < 0 and low < 4 * high:
+        return -math.sqrt(-low) * math.sqrt(-high)
+    return low + (high - low) / 2
+
+def collapsed(a, b):
+    return abs(b - a) <= 2 * sys.float_info.epsilon * max(abs(a), abs(b))
+
+def central_difference(f, x):
+    h = math.sqrt(sys.float_info.epsilon) * max(abs(x), 1.0)
+    return (f(x + h) - f(x - h)) / (2 * h)
+
+def opposite_signs(f_a, f_b):
+    return (f_a < 0) != (f_b < 0)
+
+@root_finder('bisection', bracketing=True)
+def bisection(f, low, high, f_low, f_high, tolerance, max_iterations, derivative=None):
+    x, f_x = (low, f_low) if abs(f_low) < abs(f_high) else (high, f_high)
+    for iteration in range(max_iterations):
+        if abs(f_x) < tolerance or collapsed(low, high):
+            return x, f_x, iteration
+        x = midpoint(low, high)
+        f_x = f(x)
+        if opposite_signs(f_low, f_x):
+            high = x
+        else:
+            low, f_low = x, f_x
+    return x, f_x, max_iterations
+
+@root_finder('newton')
+def newton(f, low, high, f_low, f_high, tolerance, max_iterations, derivative=None):
+    # Starts from the better end of the bracket; without a derivative it uses a central
+    # difference, which costs two more evaluations per step
+    if derivative is None:
+        def derivative(x):
+            return central_difference(f, x)
+    x, f_x = (low, f_low) if abs(f_low) < abs(f_high) else (high, f_high)
+    for iteration in range(max_iterations):
+        if abs(f_x) < tolerance:
+            return x, f_x, iteration
+        slope = derivative(x)
+        if slope == 0 or not math.isfinite(slope):
+            return x, f_x, iteration
+        step = f_x / slope
+        if abs(step) <= 2 * sys.float_info.epsilon * abs(x):
+            return x, f_x, iteration
+        x -= step
+        f_x = f(x)
+    return x, f_x, max_iterations
+
+@root_finder('secant')
+def secant(f, low, high, f_low, f_high, tolerance, max_iterations, derivative=None):
+    previous, f_previous, x, f_x = low, f_low, high, f_high
+    if abs(f_previous) < abs(f_x):
+        previous, f_previous, x, f_x = x, f_x, previous, f_previous
+    for iteration in range(max_iterations):
+        if abs(f_x) < tolerance or f_x == f_previous or collapsed(previous, x):
+            return x, f_x, iteration
+        # Dividing before multiplying keeps huge values of f from overflowing
+        previous, f_previous, x = x, f_x, x - (x - previous) / (f_x - f_previous) * f_x
+        f_x = f(x)
+    return x, f_x, max_iterations
+
+@root_finder('brent', bracketing=True)
+def brent(f, low, high, f_low, f_high, tolerance, max_iterations, derivative=None):
+    # Brent-Dekker: inverse quadratic or secant steps while they shrink the bracket fast enough,
+    # bisection otherwise. b is the best estimate, [b, c] always brackets the root, and every
+    # step moves b by at least a few ulps so the bracket keeps closing.
+    a, f_a, b, f_b = low, f_low, high, f_high
+    c, f_c = b, f_b
+    step = previous_step = b - a
+    for iteration in range(max_iterations):
+        if not opposite_signs(f_b, f_c):
+            c, f_c = a, f_a
+            step = previous_step = b - a
+        if abs(f_c) < abs(f_b):
+            a, f_a, b, f_b, c, f_c = b, f_b, c, f_c, b, f_b
+
+        minimum_step = 2 * sys.float_info.epsilon * abs(b)
+        half_width = (c - b) / 2
+        if abs(f_b) < tolerance or abs(half_width) <= minimum_step:
+            return b, f_b, iteration
+
+        if abs(previous_step) >= minimum_step and abs(f_a) > abs(f_b):
+            # Written as ratios of values of f so that huge values do not overflow
+            s = f_b / f_a
+            if a == c:
+                p, q = 2 * half_width * s, 1 - s
+            else:
+                q, r = f_a / f_c, f_b / f_c
+                p = s * (2 * half_width * q * (q - r) - (b - a) * (r - 1))
+                q = (q - 1) * (r - 1) * (s - 1)
+            if p > 0:
+                q = -q
+            p = abs(p)
+            if 2 * p < min(3 * half_width * q - abs(minimum_step * q), abs(previous_step * q)):
+                previous_step, step = step, p / q
+            else:
+                step = previous_step = midpoint(min(b, c), max(b, c)) - b
+        else:
+            step = previous_step = midpoint(min(b, c), max(b, c)) - b
+
+        a, f_a = b, f_b
+        b += step if abs(step) > minimum_step else math.copysign(minimum_step, half_width)
+        f_b = f(b)
+    return b, f_b, max_iterations
+
+def exponent_bracket(target, power=2):
+    # For a target in [2**(e-1), 2**e) the root lies in [2**((e-1)/power), 2**(e/power)),
+    # so powers of two from the float exponent bracket it within a factor of 2-4
+    _, exponent = math.frexp(target)
+    return (math.ldexp(1.0, math.floor((exponent - 1) / power)),
+            math.ldexp(1.0, math.ceil(exponent / power)))
+
+def expand_bracket(f, low, high, f_low, f_high, max_expansions=MAX_EXPANSIONS):
+    # Widens [low, high] away from its better end, squaring the growth factor each time, until
+    # f changes sign; a dozen steps cover the whole float range
+    factor = 2.0
+    for _ in range(max_expansions):
+        if not opposite_signs(f_low, f_high) and f_low and f_high:
+            width = (high - low) * factor
+            if abs(f_low) < abs(f_high):
+                low = low - width
+                f_low = f(low)
+            else:
+                high = high + width
+                f_high = f(high)
+            factor *= factor
+    return low, high, f_low, f_high
+
+def relative_error(f, root, f_root, derivative=None):
+    # Estimated |root - true root| / |root| from one Newton step; absolute when the root is 0
+    if f_root == 0:
+        return 0.0
+    slope = derivative(root) if derivative is not None else central_difference(f, root)
+    if slope == 0 or not math.isfinite(slope):
+        return math.inf
+    return abs(f_root / slope) / (abs(root) or 1.0)
+
+def find_root(f, low, high, method='brent', tolerance=1e-7, max_iterations=100, derivative=None,
+              expand=False):
+    # Runs one method and reports on it: root, converged, iterations, evaluations of f by the
+    # method (including the bracket ends and any expansion), error = |f(root)|, the estimated
+    # relative error of the root, the bracket that was used and the time taken. A root has
+    # converged when |f(root)| < tolerance or its relative error is below tolerance, since for
+    # large roots |f| cannot get below the rounding error of f near them.
+    try:
+        finder = ROOT_FINDERS[method]
+    except KeyError:
+        raise ValueError(f'unknown method {method!r}, expected one of '
+                         f'{", ".join(ROOT_FINDERS)}') from None
+    evaluations = 0
+
+    def counted(x):
+        nonlocal evaluations
+        evaluations += 1
+        return f(x)
+
+    started = time.perf_counter()
+    low, high = min(low, high), max(low, high)
+    f_low, f_high = counted(low), counted(high)
+    if expand:
+        low, high, f_low, f_high = expand_bracket(counted, low, high, f_low, f_high)
+    if method in BRACKETING_METHODS and f_low and f_high and not opposite_signs(f_low, f_high):
+        raise ValueError(f'{method} needs f(low) and f(high) of opposite signs, '
+                         f'got f({low})={f_low} and f({high})={f_high}')
+
+    root, f_root, iterations = finder(counted, low, high, f_low, f_high, tolerance,
+                                      max_iterations, derivative)
+    seconds = time.perf_counter() - started
+    relative = relative_error(f, root, f_root, derivative)
+    return {
+        'method': method,
+        'root': root,
+        'converged': abs(f_root) < tolerance or relative < tolerance,
+        'iterations': iterations,
+        'evaluations': evaluations,
+        'error': abs(f_root),
+        'relative_error': relative,
+        'bracket': (low, high),
+        'seconds': seconds,
+    }
+
+def square_root(square_target, method='brent', tolerance=1e-7, max_iterations=100):
+    if square_target < 0:
+        raise ValueError('Square root of negative number is not defined in real numbers')
+    if square_target == 0:
+        return {'method': method, 'root': 0.0, 'converged': True, 'iterations': 0,
+                'evaluations': 0, 'error': 0.0, 'relative_error': 0.0, 'bracket': (0.0, 0.0),
+                'seconds': 0.0}
+    # Solved relative to the target, x*x/target - 1, so the tolerance means the same for tiny
+    # and huge targets; dividing first keeps x*x from overflowing or underflowing
+    low, high = exponent_bracket(square_target)
+    return find_root(lambda x: x / square_target * x - 1, low, high, method, tolerance,
+                     max_iterations, derivative=lambda x: 2 * x / square_target)
+
+def compare_root_finders(f, low, high, methods=None, **options):
+    # Stats of every method on the same problem, fastest first
+    results = [find_root(f, low, high, method, **options) for method in methods or ROOT_FINDERS]
+    return sorted(results, key=lambda stats: stats['seconds'])
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare root-finding methods on square roots')
+    parser.add_argument('targets', nargs='*', type=float, default=[N])
+    parser.add_argument('--tolerance', type=float, default=1e-7)
+    parser.add_argument('--max-iterations', type=int, default=100)
+    args = parser.parse_args()
+
+    for target in args.targets:
+        print(f'\nSquare root of {target}:')
+        for method in ROOT_FINDERS:
+            stats = square_root(target, method, args.tolerance, args.max_iterations)
+            status = 'converged' if stats['converged'] else 'did not converge'
+            print(f"{method:>10}: {stats['root']:.17g} {status} after {stats['iterations']} "
+                  f"iterations, {stats['evaluations']} evaluations, error {stats['error']:.3g} "
+                  f"(relative {stats['relative_error']:.3g}), "
+                  f"{stats['seconds'] * 1e6:.0f} us")
+
 N = 16
 
+if __name__ == '__main__':
+    main()
+